@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from . import compat, core, devwatch, loadtest, verify
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    source = Path(args.source)
+    theme_id = args.theme_id or source.name
+    devwatch.watch_theme(
+        source,
+        Path(args.root),
+        theme_id,
+        reload=args.reload,
+        port=args.port,
+        poll_interval=args.interval,
+        debounce=args.debounce,
+    )
+    return 0
+
+
+def cmd_loadtest(args: argparse.Namespace) -> int:
+    root = Path(args.root)
+    themes = args.theme or [key for key in core.discover_themes(root) if key not in ("default", "minimal")]
+    if not themes:
+        raise RuntimeError("未发现可测试的主题。")
+    results = loadtest.compare_themes(
+        root,
+        themes,
+        clients=args.clients,
+        video_chunk=args.video_chunk * 1024,
+        video_budget=args.video_budget * 1024,
+    )
+    print(loadtest.format_report(results))
+    return 0 if all(not r.get("error") and r["total"]["errors"] == 0 for r in results) else 2
+
+
+def cmd_verify(args: argparse.Namespace) -> int:
+    results = verify.verify_fleet([Path(root) for root in args.roots], workers=args.workers)
+    print(verify.format_results(results, verbose=args.verbose))
+    return 0 if all(r["ok"] for r in results) else 2
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    root = Path(args.root)
+    label = args.label or core.discover_themes(root).get(args.theme_id, args.theme_id)
+    if args.dest == "-":
+        core.export_theme(root, args.theme_id, label, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        core.export_theme(root, args.theme_id, label, Path(args.dest))
+    print(f"已导出主题 {args.theme_id} -> {args.dest}", file=sys.stderr)
+    return 0
+
+
+def cmd_pack(args: argparse.Namespace) -> int:
+    source = Path(args.source)
+    if args.dest == "-":
+        core.pack_external_theme(source, args.theme_id, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        core.pack_external_theme(source, args.theme_id, Path(args.dest))
+    print(f"已打包主题 {args.theme_id} -> {args.dest}", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    root = Path(args.root)
+    core.import_theme(root, sys.stdin.buffer if args.source == "-" else Path(args.source))
+    print(f"已导入主题: {args.source}", file=sys.stderr)
+    return 0
+
+
+def cmd_compat(args: argparse.Namespace) -> int:
+    corpus = Path(args.corpus)
+    cache_path = None if args.no_cache else Path(args.cache or corpus / compat.CACHE_NAME)
+    results = compat.run_matrix(corpus, workers=args.workers, cache_path=cache_path)
+    if not results:
+        raise RuntimeError("语料目录中没有包含 foundry.mjs 与 constants.mjs 的构建。")
+    print(compat.format_matrix(results))
+    return 0 if all(r["ok"] for r in results) else 2
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的整数: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须至少为 1: {value}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m installer_app.cli", description="FVTT Join Theme 命令行工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    watch = sub.add_parser("watch", help="监视主题源目录并热同步到 FVTT 根目录")
+    watch.add_argument("source", help="主题源目录（包含 joinmenu.js、*.hbs、*.css）")
+    watch.add_argument("root", help="FVTT 根目录")
+    watch.add_argument("--theme-id", help="主题 ID，默认取源目录名")
+    watch.add_argument("--reload", action="store_true", help="通过本地 WebSocket 通知浏览器刷新")
+    watch.add_argument("--port", type=int, default=devwatch.RELOAD_PORT, help="刷新服务端口")
+    watch.add_argument("--interval", type=float, default=devwatch.POLL_INTERVAL, help="轮询间隔（秒）")
+    watch.add_argument("--debounce", type=float, default=devwatch.DEBOUNCE_SECONDS, help="去抖时间（秒）")
+    watch.set_defaults(func=cmd_watch)
+
+    load = sub.add_parser("loadtest", help="模拟多名玩家同时打开登录页，对比各主题的资源加载延迟")
+    load.add_argument("root", help="已打补丁的 FVTT 根目录")
+    load.add_argument("--theme", action="append", help="要测试的主题 ID，可重复；默认测试全部已注册主题")
+    load.add_argument("--clients", type=_positive_int, default=loadtest.DEFAULT_CLIENTS, help="并发客户端数量")
+    load.add_argument("--video-chunk", type=_positive_int, default=loadtest.VIDEO_CHUNK // 1024, help="视频 Range 请求大小（KB）")
+    load.add_argument("--video-budget", type=int, default=loadtest.VIDEO_BUDGET // 1024, help="每个客户端读取的视频总量（KB）")
+    load.set_defaults(func=cmd_loadtest)
+
+    check = sub.add_parser("verify", help="并行校验多个 FVTT 根目录的补丁与主题文件是否偏离安装时的状态")
+    check.add_argument("roots", nargs="+", help="FVTT 根目录，可传入多个")
+    check.add_argument("--workers", type=int, default=verify.FLEET_WORKERS, help="同时校验的根目录数量")
+    check.add_argument("-v", "--verbose", action="store_true", help="列出每个偏差文件")
+    check.set_defaults(func=cmd_verify)
+
+    export = sub.add_parser("export", help="导出已安装主题为 ZIP，dest 为 - 时写到 stdout")
+    export.add_argument("root", help="FVTT 根目录")
+    export.add_argument("theme_id", help="主题 ID")
+    export.add_argument("dest", help="输出 ZIP 路径，或 - 表示 stdout")
+    export.add_argument("--label", help="主题显示名称，默认读取 WORLD_JOIN_THEMES")
+    export.set_defaults(func=cmd_export)
+
+    pack = sub.add_parser("pack", help="将主题源目录打包为 ZIP，dest 为 - 时写到 stdout")
+    pack.add_argument("source", help="主题源目录")
+    pack.add_argument("theme_id", help="主题 ID")
+    pack.add_argument("dest", help="输出 ZIP 路径，或 - 表示 stdout")
+    pack.set_defaults(func=cmd_pack)
+
+    imp = sub.add_parser("import", help="导入主题 ZIP，source 为 - 时从 stdin 流式读取")
+    imp.add_argument("root", help="FVTT 根目录")
+    imp.add_argument("source", help="主题 ZIP 路径，或 - 表示 stdin")
+    imp.set_defaults(func=cmd_import)
+
+    matrix = sub.add_parser("compat", help="在多个 Foundry 构建的原始 bundle 上并行测试补丁兼容性")
+    matrix.add_argument("corpus", help="语料目录，每个子目录包含一个构建的 foundry.mjs 与 constants.mjs")
+    matrix.add_argument("--workers", type=int, help="进程数，默认与 CPU 核数相同")
+    matrix.add_argument("--cache", help=f"结果缓存文件，默认为语料目录下的 {compat.CACHE_NAME}")
+    matrix.add_argument("--no-cache", action="store_true", help="忽略缓存，全部重新测试")
+    matrix.set_defaults(func=cmd_compat)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except Exception as exc:
+        print(f"错误: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import core
+
+CACHE_NAME = ".compat-cache.json"
+PROBE_ID = "compat_probe"
+PROBE_LABEL = "Compat Probe"
+PROBE_SCRIPT = f"joinmenu-so-nice/{PROBE_ID}/joinmenu.js"
+STEPS = ("detect", "patch", "repatch", "restore")
+
+
+def logic_fingerprint() -> str:
+    """补丁逻辑（core.py）的指纹；逻辑变化后旧缓存自动失效。"""
+    return hashlib.sha256(Path(core.__file__).read_bytes()).hexdigest()
+
+
+def find_corpus(corpus_dir: Path) -> List[Tuple[str, Path, Path]]:
+    """语料目录下每个子目录代表一个 Foundry 构建，内含原始的 foundry.mjs 与 constants.mjs（位置不限）。"""
+    cases = []
+    for entry in sorted(os.scandir(corpus_dir), key=lambda e: e.name):
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+        build_root = Path(entry.path)
+        try:
+            foundry_path = core.find_foundry_file(build_root)
+            constants_path = core.find_constants_file(build_root)
+        except RuntimeError:
+            continue
+        cases.append((entry.name, foundry_path, constants_path))
+    return cases
+
+
+def bundle_hash(foundry_path: Path, constants_path: Path) -> str:
+    digest = hashlib.sha256()
+    for path in (foundry_path, constants_path):
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _detect(foundry: str, constants: str) -> str:
+    if not core.WORLD_PATTERN.search(foundry):
+        raise RuntimeError("foundry.mjs 未找到 WORLD_JOIN_THEMES")
+    if not core.WORLD_PATTERN.search(constants):
+        raise RuntimeError("constants.mjs 未找到 WORLD_JOIN_THEMES")
+    match = core.JOIN_VIEW_HEADER_PATTERN.search(foundry)
+    if not match:
+        raise RuntimeError("未找到 #joinView 定义")
+    core._find_block_end(foundry, match.end() - 1)
+    return "已有 JOIN_THEME_SCRIPTS" if core.SCRIPT_PATTERN.search(foundry) else ""
+
+
+def run_case(name: str, foundry_path: str, constants_path: str) -> Dict[str, object]:
+    """在临时根目录中依次执行 检测 -> 打补丁 -> 重复打补丁（幂等） -> 恢复备份，记录每步结果与耗时。"""
+    result: Dict[str, object] = {"name": name, "steps": {}}
+    steps: Dict[str, Dict[str, object]] = result["steps"]
+    original_foundry = Path(foundry_path).read_bytes()
+    original_constants = Path(constants_path).read_bytes()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        target_foundry = root / "public/scripts/foundry.mjs"
+        target_constants = root / "common/constants.mjs"
+        target_foundry.parent.mkdir(parents=True)
+        target_constants.parent.mkdir(parents=True)
+        shutil.copyfile(foundry_path, target_foundry)
+        shutil.copyfile(constants_path, target_constants)
+
+        def patch():
+            core.apply_patches(root, {PROBE_ID: PROBE_LABEL}, {PROBE_ID: PROBE_SCRIPT})
+            content = target_foundry.read_text(encoding="utf-8")
+            if "Join theme loader" not in content:
+                raise RuntimeError("#joinView 未被替换")
+            if core.discover_themes(root).get(PROBE_ID) != PROBE_LABEL:
+                raise RuntimeError("WORLD_JOIN_THEMES 未写入测试主题")
+            if core.discover_theme_scripts(root).get(PROBE_ID) != PROBE_SCRIPT:
+                raise RuntimeError("JOIN_THEME_SCRIPTS 未写入测试主题")
+            return ""
+
+        def repatch():
+            before = (target_foundry.read_bytes(), target_constants.read_bytes())
+            core.apply_patches(root, {PROBE_ID: PROBE_LABEL}, {PROBE_ID: PROBE_SCRIPT})
+            if (target_foundry.read_bytes(), target_constants.read_bytes()) != before:
+                raise RuntimeError("重复打补丁后内容发生变化")
+            return ""
+
+        def restore():
+            core.restore_backups(root)
+            if target_foundry.read_bytes() != original_foundry or target_constants.read_bytes() != original_constants:
+                raise RuntimeError("恢复后内容与原始文件不一致")
+            return ""
+
+        actions = {
+            "detect": lambda: _detect(original_foundry.decode("utf-8"), original_constants.decode("utf-8")),
+            "patch": patch,
+            "repatch": repatch,
+            "restore": restore,
+        }
+        failed = False
+        for step in STEPS:
+            if failed:
+                steps[step] = {"status": "skip", "ms": 0.0, "detail": ""}
+                continue
+            started = time.perf_counter()
+            try:
+                detail = actions[step]()
+                status = "ok"
+            except Exception as exc:
+                detail = str(exc)
+                status = "fail"
+                failed = True
+            steps[step] = {"status": status, "ms": (time.perf_counter() - started) * 1000, "detail": detail}
+    result["ok"] = not failed
+    return result
+
+
+def _load_cache(cache_path: Optional[Path]) -> Dict[str, object]:
+    if not cache_path or not cache_path.exists():
+        return {}
+    try:
+        return json.loads(cache_path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def run_matrix(
+    corpus_dir: Path,
+    workers: Optional[int] = None,
+    cache_path: Optional[Path] = None,
+) -> List[Dict[str, object]]:
+    """
+    对语料中的每个构建并行执行兼容性测试。结果按 bundle 哈希与补丁逻辑指纹缓存，
+    只有新构建（或 core.py 变化后）才会重新运行。
+    """
+    cases = find_corpus(corpus_dir)
+    fingerprint = logic_fingerprint()
+    cache = _load_cache(cache_path)
+    if cache.get("logic") != fingerprint:
+        cache = {"logic": fingerprint, "results": {}}
+    cached_results: Dict[str, Dict[str, object]] = cache["results"]
+
+    results: Dict[str, Dict[str, object]] = {}
+    pending = []
+    for name, foundry_path, constants_path in cases:
+        digest = bundle_hash(foundry_path, constants_path)
+        if digest in cached_results:
+            results[name] = dict(cached_results[digest], name=name, hash=digest, cached=True)
+        else:
+            pending.append((name, digest, foundry_path, constants_path))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(run_case, name, str(foundry_path), str(constants_path)): (name, digest)
+                for name, digest, foundry_path, constants_path in pending
+            }
+            for future, (name, digest) in futures.items():
+                result = future.result()
+                cached_results[digest] = {"steps": result["steps"], "ok": result["ok"]}
+                results[name] = dict(result, hash=digest, cached=False)
+
+    if cache_path:
+        tmp = cache_path.with_name(cache_path.name + ".tmp")
+        tmp.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, cache_path)
+    return [results[name] for name, _, _ in cases]
+
+
+def format_matrix(results: List[Dict[str, object]]) -> str:
+    rows = [("构建", "哈希", *STEPS, "缓存")]
+    for result in results:
+        cells = []
+        for step in STEPS:
+            info = result["steps"][step]
+            if info["status"] == "skip":
+                cells.append("-")
+            else:
+                cells.append(f"{'OK' if info['status'] == 'ok' else 'FAIL'} {info['ms']:.1f}ms")
+        rows.append((str(result["name"]), str(result["hash"])[:12], *cells, "是" if result.get("cached") else ""))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip() for row in rows]
+    lines.insert(1, "-" * len(lines[0]))
+    for result in results:
+        for step in STEPS:
+            info = result["steps"][step]
+            if info["status"] == "fail":
+                lines.append(f"{result['name']} / {step}: {info['detail']}")
+    passed = sum(1 for r in results if r["ok"])
+    lines.append(f"共 {len(results)} 个构建，{passed} 个通过。")
+    return "\n".join(lines)
@@ -1,13 +1,28 @@
 from __future__ import annotations
 
+import fnmatch
+import hashlib
 import json
+import os
 import re
 import shutil
-import tempfile
+import struct
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, Optional, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows 使用 msvcrt 字节锁
+    fcntl = None
+    import msvcrt
+
+from . import webm, zipstream
 
 WORLD_PATTERN = re.compile(r"(const WORLD_JOIN_THEMES = Object\.freeze\()\s*\{([\s\S]*?)\}(\s*\);)", re.MULTILINE)
 SCRIPT_PATTERN = re.compile(r"(const JOIN_THEME_SCRIPTS = Object\.freeze\()\s*\{([\s\S]*?)\}(\s*\);)", re.MULTILINE)
@@ -61,6 +76,23 @@ JOIN_VIEW_BLOCK = """
 
 CONFIG_PATH = Path(__file__).parent / "config.json"
 MARKER_NAME = ".join-theme-framework.json"
+LOCK_NAME = ".join-theme-framework.lock"
+JOURNAL_NAME = ".join-theme-framework.journal"
+STAGED_SUFFIX = ".staged"
+LOCK_TIMEOUT = 30.0
+HASH_CACHE_NAME = ".join-theme-framework.hashes.json"
+THEME_DIRS = ("templates/joinmenu-so-nice", "public/joinmenu-so-nice")
+HASH_WORKERS = 8
+
+THEME_IGNORE_FILE = ".themeignore"
+DEFAULT_IGNORE_PATTERNS = ("node_modules", ".git", ".svn", ".hg", "__pycache__", "dist", "build", ".DS_Store", "Thumbs.db")
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico", ".bmp"}
+FONT_SUFFIXES = {".woff", ".woff2", ".ttf", ".otf", ".eot"}
+MEDIA_SUFFIXES = {".webm", ".mp4", ".ogv", ".ogg", ".mp3", ".wav", ".m4a"}
+STATIC_ASSET_SUFFIXES = IMAGE_SUFFIXES | FONT_SUFFIXES | MEDIA_SUFFIXES
+# 已压缩格式直接 STORED，避免对大体积视频/图片做无意义的 deflate
+STORED_SUFFIXES = (IMAGE_SUFFIXES - {".svg", ".bmp"}) | {".woff", ".woff2"} | MEDIA_SUFFIXES
+ZIP_CHUNK_SIZE = 1024 * 1024
 
 
 def _normalize_path(path: Path) -> str:
@@ -91,6 +123,15 @@ def find_constants_file(root: Path) -> Path:
     return _find_target_file(root, "common/constants.mjs", "constants.mjs", ("common",))
 
 
+def format_size(num: int) -> str:
+    size = float(num)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
 def load_tool_config() -> Dict[str, str]:
     default = {
         "version": "1.0.0",
@@ -265,49 +306,202 @@ def validate_theme_id(theme_id: str) -> str:
     return safe
 
 
+_lock_state = threading.local()
+
+
+def _try_lock(fh):
+    if fcntl:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(fh):
+    if fcntl:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def lock_root(root: Path, timeout: float = LOCK_TIMEOUT):
+    """
+    对 FVTT 根目录加建议锁（同一线程可重入），防止 CLI、GUI 或多个安装器同时改写同一目录。
+    首次获得锁时会先处理上次中断遗留的提交日志。
+    """
+    held = getattr(_lock_state, "held", None)
+    if held is None:
+        held = _lock_state.held = {}
+    key = str(root.resolve())
+    if key in held:
+        held[key][1] += 1
+        try:
+            yield
+        finally:
+            held[key][1] -= 1
+        return
+
+    fh = open(root / LOCK_NAME, "a+b")
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _try_lock(fh)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                fh.close()
+                raise RuntimeError("该目录正被其他安装进程占用，请稍后重试。")
+            time.sleep(0.1)
+    held[key] = [fh, 1]
+    try:
+        recover_pending_commit(root)
+        yield
+    finally:
+        del held[key]
+        try:
+            _unlock(fh)
+        finally:
+            fh.close()
+
+
+def _fsync_dir(path: Path):
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_durable(path: Path, data: Union[str, bytes]):
+    if isinstance(data, bytes):
+        fh = open(path, "wb")
+    else:
+        fh = open(path, "w", encoding="utf-8")
+    with fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def _write_journal(root: Path, state: str, entries: list):
+    journal = root / JOURNAL_NAME
+    tmp = journal.with_name(journal.name + ".tmp")
+    _write_durable(tmp, json.dumps({"state": state, "entries": entries}, ensure_ascii=False, indent=2))
+    os.replace(tmp, journal)
+    _fsync_dir(root)
+
+
+def _roll_forward(root: Path, entries: list):
+    # 日志中的路径相对于根目录，根目录换了挂载点也能恢复；旧版的绝对路径经 root / 拼接后保持不变
+    for entry in entries:
+        staged = root / entry["staged"]
+        if staged.exists():
+            os.replace(staged, root / entry["target"])
+    for parent in {(root / entry["target"]).parent for entry in entries}:
+        _fsync_dir(parent)
+
+
+def commit_files(root: Path, outputs: list[Tuple[Path, Union[str, bytes]]]):
+    """
+    事务式写入多个文件：先全部写入 .staged 并 fsync，日志切换为 commit 后再按 outputs 顺序逐个 rename。
+    进程中途退出时，下次加锁会根据日志状态回滚（prepare）或继续提交（commit）。
+    """
+    entries = [
+        {
+            "target": Path(os.path.relpath(path, root)).as_posix(),
+            "staged": Path(os.path.relpath(path.with_name(path.name + STAGED_SUFFIX), root)).as_posix(),
+        }
+        for path, _ in outputs
+    ]
+    _write_journal(root, "prepare", entries)
+    for (_, data), entry in zip(outputs, entries):
+        _write_durable(root / entry["staged"], data)
+    _write_journal(root, "commit", entries)
+    _roll_forward(root, entries)
+    (root / JOURNAL_NAME).unlink()
+    _fsync_dir(root)
+
+
+def recover_pending_commit(root: Path) -> Optional[str]:
+    """处理中断的提交；返回 "forward" / "back"，没有遗留日志时返回 None。"""
+    journal = root / JOURNAL_NAME
+    if not journal.exists():
+        return None
+    try:
+        data = json.loads(journal.read_text(encoding="utf-8"))
+        entries = data.get("entries", [])
+        state = data.get("state")
+    except Exception:
+        entries, state = [], None
+    if state == "commit":
+        _roll_forward(root, entries)
+        result = "forward"
+    else:
+        for entry in entries:
+            staged = root / entry["staged"]
+            if staged.exists():
+                staged.unlink()
+        result = "back"
+    journal.unlink()
+    _fsync_dir(root)
+    return result
+
+
 def apply_patches(root: Path, theme_labels: Dict[str, str], script_map: Dict[str, str]):
-    foundry_path = find_foundry_file(root)
-    constants_path = find_constants_file(root)
+    with lock_root(root):
+        foundry_path = find_foundry_file(root)
+        constants_path = find_constants_file(root)
 
-    backup(foundry_path)
-    backup(constants_path)
+        backup(foundry_path)
+        backup(constants_path)
 
-    foundry_data = foundry_path.read_text(encoding="utf-8")
-    constants_data = constants_path.read_text(encoding="utf-8")
+        foundry_data = foundry_path.read_text(encoding="utf-8")
+        constants_data = constants_path.read_text(encoding="utf-8")
 
-    sanitized_labels = {validate_theme_id(k): v for k, v in theme_labels.items()}
-    sanitized_scripts = {validate_theme_id(k): v for k, v in script_map.items()}
+        sanitized_labels = {validate_theme_id(k): v for k, v in theme_labels.items()}
+        sanitized_scripts = {validate_theme_id(k): v for k, v in script_map.items()}
 
-    foundry_data = patch_block(foundry_data, WORLD_PATTERN, sanitized_labels)
-    foundry_data = insert_script_map(foundry_data, sanitized_scripts)
-    foundry_data = patch_join_view(foundry_data)
-    constants_data = patch_block(constants_data, WORLD_PATTERN, sanitized_labels)
+        foundry_data = patch_block(foundry_data, WORLD_PATTERN, sanitized_labels)
+        foundry_data = insert_script_map(foundry_data, sanitized_scripts)
+        foundry_data = patch_join_view(foundry_data)
+        constants_data = patch_block(constants_data, WORLD_PATTERN, sanitized_labels)
 
-    foundry_path.write_text(foundry_data, encoding="utf-8")
-    constants_path.write_text(constants_data, encoding="utf-8")
-    write_marker(root, load_tool_config())
+        commit_files(root, [
+            (foundry_path, foundry_data),
+            (constants_path, constants_data),
+            (root / MARKER_NAME, marker_text(load_tool_config(), hash_theme_files(root))),
+        ])
 
 
 def restore_backups(root: Path):
-    for finder in (find_foundry_file, find_constants_file):
-        try:
-            path = finder(root)
-        except RuntimeError:
-            continue
-        backup_path = path.with_suffix(path.suffix + ".backup")
-        if backup_path.exists():
-            shutil.copy2(backup_path, path)
-    marker = root / MARKER_NAME
-    if marker.exists():
-        marker.unlink()
+    with lock_root(root):
+        outputs = []
+        for finder in (find_foundry_file, find_constants_file):
+            try:
+                path = finder(root)
+            except RuntimeError:
+                continue
+            backup_path = path.with_suffix(path.suffix + ".backup")
+            if backup_path.exists():
+                outputs.append((path, backup_path.read_bytes()))
+        if outputs:
+            commit_files(root, outputs)
+        marker = root / MARKER_NAME
+        if marker.exists():
+            marker.unlink()
 
 
 def copy_resources(root: Path, resource_root: Path, entries: Iterable[str]):
-    for rel in entries:
-        src = resource_root / rel
-        dst = root / rel
-        dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst)
+    with lock_root(root):
+        for rel in entries:
+            src = resource_root / rel
+            dst = root / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
 
 
 def ensure_simple_theme(root: Path, resource_root: Path):
@@ -321,16 +515,40 @@ def ensure_simple_theme(root: Path, resource_root: Path):
     copy_resources(root, resource_root, assets)
 
 
-def set_theme_background_video(root: Path, theme_id: str, source_video: Path) -> Path:
+def check_background_video(source_video: Path, budget: Optional[Dict[str, Dict[str, object]]] = None) -> Tuple[str, list, Dict[str, object]]:
+    """解析 WebM 头部并按快速起播预算评估，返回 (结论, 原因列表, 解析报告)。"""
+    try:
+        report = webm.analyze_webm(source_video)
+    except (EOFError, struct.error, IndexError, OverflowError):
+        raise ValueError("WebM 文件不完整，无法解析。")
+    if budget is None:
+        budget = load_tool_config().get("webm_budget")
+    verdict, reasons = webm.evaluate_webm(report, budget)
+    return verdict, reasons, report
+
+
+def set_theme_background_video(
+    root: Path,
+    theme_id: str,
+    source_video: Path,
+    budget: Optional[Dict[str, Dict[str, object]]] = None,
+    checked: Optional[Tuple[str, list, Dict[str, object]]] = None,
+) -> Path:
+    """checked 为调用方已得到的 check_background_video 结果，传入时不再重复解析视频。"""
     if not source_video.exists():
         raise FileNotFoundError("所选视频文件不存在。")
     if source_video.suffix.lower() != ".webm":
         raise ValueError("仅支持 WebM 视频。")
+    verdict, reasons, _ = checked or check_background_video(source_video, budget)
+    if verdict == "refuse":
+        raise ValueError("视频不满足快速起播要求：" + "；".join(reasons))
     dest_dir = root / "public/joinmenu-so-nice" / theme_id
     if not dest_dir.exists():
         raise RuntimeError("未找到该主题的 public 目录。请先安装该主题。")
     dest_path = dest_dir / "background.webm"
-    shutil.copy2(source_video, dest_path)
+    with lock_root(root):
+        shutil.copy2(source_video, dest_path)
+        refresh_manifest(root)
     return dest_path
 
 
@@ -341,7 +559,9 @@ def remove_theme_background_video(root: Path, theme_id: str) -> Path:
     dest_path = dest_dir / "background.webm"
     if not dest_path.exists():
         raise FileNotFoundError("该主题尚未附加背景视频。")
-    dest_path.unlink()
+    with lock_root(root):
+        dest_path.unlink()
+        refresh_manifest(root)
     return dest_path
 
 
@@ -357,37 +577,211 @@ def discover_themes(root: Path) -> Dict[str, str]:
     return load_mapping(match.group(2))
 
 
-def import_theme(root: Path, zip_path: Path):
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        members = zf.namelist()
-        if "theme.json" not in members:
-            raise RuntimeError("压缩包缺少 theme.json")
-        tmpdir = Path(tempfile.mkdtemp())
-        try:
-            zf.extractall(tmpdir)
-            meta = json.loads((tmpdir / "theme.json").read_text(encoding="utf-8"))
-            theme_id = meta["id"]
-            label = meta["label"]
-            script = meta["script"]
-
-            for section in ("templates", "public"):
-                source = tmpdir / section
-                if not source.exists():
-                    continue
-                for item in source.rglob("*"):
-                    if item.is_file():
-                        rel = item.relative_to(source)
-                        dest = root / section / rel
-                        dest.parent.mkdir(parents=True, exist_ok=True)
-                        shutil.copy2(item, dest)
-        finally:
-            shutil.rmtree(tmpdir)
+def discover_theme_scripts(root: Path) -> Dict[str, str]:
+    try:
+        foundry_path = find_foundry_file(root)
+    except RuntimeError:
+        return {}
+    content = foundry_path.read_text(encoding="utf-8")
+    match = SCRIPT_PATTERN.search(content)
+    if not match:
+        return {}
+    return load_mapping(match.group(2))
 
-    safe_id = validate_theme_id(theme_id)
-    apply_patches(root, {safe_id: label}, {safe_id: script})
+
+def _member_target(root: Path, name: str) -> Optional[Path]:
+    """只接受 templates/ 与 public/ 下的成员，拒绝绝对路径与 .. 穿越。"""
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if len(parts) < 2 or parts[0] not in ("templates", "public") or ".." in parts:
+        return None
+    if name.startswith("/") or any(":" in part for part in parts):
+        return None
+    return root.joinpath(*parts)
+
+
+def _zip_member_chunks(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[bytes]:
+    with zf.open(info) as fh:
+        for chunk in iter(lambda: fh.read(ZIP_CHUNK_SIZE), b""):
+            yield chunk
 
 
-def export_theme(root: Path, theme_id: str, label: str, dest: Path):
+def _install_members(root: Path, members: Iterable[Tuple[str, Iterable[bytes]]], require_meta_first: bool) -> Dict[str, str]:
+    """
+    先把所有成员写入同目录下的 .staged 文件；整个压缩包读完、CRC 全部通过且 theme.json 有效后，
+    才逐个 rename 到目标位置。任何异常都会删除已暂存的文件，目标目录保持原样。
+    """
+    meta = None
+    staged: Dict[Path, Path] = {}
+    try:
+        for name, chunks in members:
+            if name == "theme.json":
+                meta = json.loads(b"".join(chunks).decode("utf-8"))
+                continue
+            if require_meta_first and meta is None:
+                raise RuntimeError("流式导入要求 theme.json 位于压缩包开头。")
+            dest = _member_target(root, name)
+            if dest is None or name.endswith("/"):
+                continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(dest.name + STAGED_SUFFIX)
+            staged[dest] = tmp
+            with tmp.open("wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        if meta is None:
+            raise RuntimeError("压缩包缺少 theme.json")
+        missing = [key for key in ("id", "label", "script") if not meta.get(key)]
+        if missing:
+            raise RuntimeError(f"theme.json 缺少字段: {', '.join(missing)}")
+        for dest, tmp in staged.items():
+            os.replace(tmp, dest)
+    except BaseException:
+        for tmp in staged.values():
+            if tmp.exists():
+                tmp.unlink()
+        raise
+    return meta
+
+
+def _import_zip_stream(root: Path, stream: BinaryIO) -> Dict[str, str]:
+    try:
+        seekable = stream.seekable()
+    except (AttributeError, OSError):
+        seekable = False
+    if not seekable:
+        return _install_members(root, zipstream.iter_zip_stream(stream), require_meta_first=True)
+    with zipfile.ZipFile(stream, "r") as zf:
+        if "theme.json" not in zf.namelist():
+            raise RuntimeError("压缩包缺少 theme.json")
+        members = ((info.filename, _zip_member_chunks(zf, info)) for info in zf.infolist())
+        return _install_members(root, members, require_meta_first=False)
+
+
+def import_theme(root: Path, source: Union[Path, BinaryIO]):
+    """从 ZIP 文件路径或任意二进制流（含管道、stdin 等不可 seek 的流）导入主题，成员校验通过后才就位。"""
+    with lock_root(root):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as fh:
+                meta = _import_zip_stream(root, fh)
+        else:
+            meta = _import_zip_stream(root, source)
+        theme_id = meta["id"]
+        label = meta["label"]
+        script = meta["script"]
+
+        safe_id = validate_theme_id(theme_id)
+        apply_patches(root, {safe_id: label}, {safe_id: script})
+
+
+def _load_ignore_patterns(source_dir: Path) -> list[str]:
+    patterns = list(DEFAULT_IGNORE_PATTERNS)
+    ignore_file = source_dir / THEME_IGNORE_FILE
+    if ignore_file.exists():
+        for line in ignore_file.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                patterns.append(line.strip("/"))
+    return patterns
+
+
+def _is_ignored(rel: str, name: str, patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel, pattern) for pattern in patterns)
+
+
+def walk_theme_source(source_dir: Path) -> Iterable[Tuple[str, os.DirEntry]]:
+    """单次 os.scandir 遍历源目录，按 .themeignore 与默认规则跳过目录，产出 (相对路径, DirEntry)。"""
+    patterns = _load_ignore_patterns(source_dir)
+    stack = [(source_dir, "")]
+    while stack:
+        current, prefix = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            rel = prefix + entry.name
+            if entry.name == THEME_IGNORE_FILE or _is_ignored(rel, entry.name, patterns):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append((Path(entry.path), rel + "/"))
+            elif entry.is_file():
+                yield rel, entry
+
+
+def theme_source_kind(rel: str) -> Optional[str]:
+    """源文件所属分组：script / templates / styles / assets；不属于主题的文件返回 None。"""
+    name = rel.rsplit("/", 1)[-1]
+    suffix = os.path.splitext(name)[1].lower()
+    if name == "joinmenu.js":
+        return "script"
+    if suffix == ".hbs":
+        return "templates"
+    if suffix == ".css":
+        return "styles"
+    if suffix in STATIC_ASSET_SUFFIXES:
+        return "assets"
+    return None
+
+
+def select_theme_sources(rels: Iterable[str]) -> Dict[str, list]:
+    """
+    按相对路径分组并挑选实际参与打包/同步的文件，返回 script / templates / styles / assets 四组相对路径。
+    与旧逻辑保持一致：只取最浅的 joinmenu.js；根目录下存在模板或样式时只取根目录的那一批。
+    """
+    script: Optional[str] = None
+    groups: Dict[str, list] = {"templates": [], "styles": [], "assets": []}
+    for rel in sorted(rels):
+        kind = theme_source_kind(rel)
+        if kind == "script":
+            if script is None or rel.count("/") < script.count("/"):
+                script = rel
+        elif kind:
+            groups[kind].append(rel)
+    for key in ("templates", "styles"):
+        top_level = [rel for rel in groups[key] if "/" not in rel]
+        if top_level:
+            groups[key] = top_level
+    return {"script": [script] if script else [], **groups}
+
+
+def scan_theme_source(source_dir: Path) -> Dict[str, list]:
+    """一次遍历完成文件分类，返回 script / templates / styles / assets 四组 (相对路径, Path)。"""
+    paths = {rel: Path(entry.path) for rel, entry in walk_theme_source(source_dir)}
+    selected = select_theme_sources(paths)
+    return {key: [(rel, paths[rel]) for rel in rels] for key, rels in selected.items()}
+
+
+def theme_target(rel: str, theme_id: str) -> Optional[str]:
+    """
+    源目录相对路径 -> FVTT 根目录下的目标路径；不属于主题的文件返回 None。
+    模板统一平铺到 templates/ 下；public/ 下的样式与资源保留相对路径，CSS 中的 url(../fonts/...) 才能继续生效。
+    """
+    safe_id = validate_theme_id(theme_id)
+    kind = theme_source_kind(rel)
+    if kind == "script":
+        return f"public/joinmenu-so-nice/{safe_id}/joinmenu.js"
+    if kind == "templates":
+        return f"templates/joinmenu-so-nice/{safe_id}/{rel.rsplit('/', 1)[-1]}"
+    if kind in ("styles", "assets"):
+        return f"public/joinmenu-so-nice/{safe_id}/{rel}"
+    return None
+
+
+def _zip_write_file(zf: zipfile.ZipFile, src: Path, arcname: str):
+    """分块写入单个成员；已压缩的媒体格式使用 STORED。"""
+    info = zipfile.ZipInfo.from_file(src, arcname)
+    if src.suffix.lower() in STORED_SUFFIXES:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    force_zip64 = info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+    with src.open("rb") as fh, zf.open(info, "w", force_zip64=force_zip64) as out:
+        shutil.copyfileobj(fh, out, ZIP_CHUNK_SIZE)
+
+
+def export_theme(root: Path, theme_id: str, label: str, dest: Union[Path, BinaryIO]):
+    """dest 可以是文件路径，也可以是任意可写二进制流（stdout、管道、socket），成员分块写入，内存占用恒定。"""
     safe_id = validate_theme_id(theme_id)
     tpl_dir = root / "templates/joinmenu-so-nice" / safe_id
     pub_dir = root / "public/joinmenu-so-nice" / safe_id
@@ -402,31 +796,25 @@ def export_theme(root: Path, theme_id: str, label: str, dest: Path):
             for item in folder.rglob("*"):
                 if item.is_file():
                     rel = Path(section) / base / item.relative_to(folder)
-                    zf.write(item, rel)
+                    _zip_write_file(zf, item, rel.as_posix())
 
 
-def pack_external_theme(source_dir: Path, theme_id: str, dest: Path):
+def pack_external_theme(source_dir: Path, theme_id: str, dest: Union[Path, BinaryIO]):
     """
     将任意目录结构打包为可导入主题。
     目录需要包含:
       - joinmenu.js
       - *.hbs 模板
-      - custom.css 等静态资源
+      - custom.css 等样式
+    图片、字体、视频等静态资源按相对路径一并打包，.themeignore 中的条目会被跳过。
+    dest 可以是文件路径或任意可写二进制流。
     """
-    joinmenu = next(source_dir.rglob("joinmenu.js"), None)
-    if not joinmenu:
+    source = scan_theme_source(source_dir)
+    if not source["script"]:
         raise RuntimeError("未找到 joinmenu.js")
-
-    template_files = list(source_dir.glob("*.hbs"))
-    if not template_files:
-        template_files = list(source_dir.rglob("*.hbs"))
-    if not template_files:
+    if not source["templates"]:
         raise RuntimeError("未找到任何 .hbs 模板")
-
-    css_files = list(source_dir.glob("*.css"))
-    if not css_files:
-        css_files = list(source_dir.rglob("*.css"))
-    if not css_files:
+    if not source["styles"]:
         raise RuntimeError("未找到任何 .css 文件")
 
     safe_id = validate_theme_id(theme_id)
@@ -438,27 +826,108 @@ def pack_external_theme(source_dir: Path, theme_id: str, dest: Path):
 
     with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as zf:
         zf.writestr("theme.json", json.dumps(meta, ensure_ascii=False, indent=2))
-        # 写入 templates，统一放在 templates/joinmenu-so-nice/<id>/
-        templates_root = Path("templates") / "joinmenu-so-nice" / safe_id
-        for file in template_files:
-            arcname = templates_root / file.name
-            zf.write(file, arcname)
-        # 写入 public/joinmenu-so-nice/<id>/
-        public_root = Path("public") / "joinmenu-so-nice" / safe_id
-        for file in css_files:
-            arcname = public_root / file.name
-            zf.write(file, arcname)
-        zf.write(joinmenu, public_root / "joinmenu.js")
-
-
-def write_marker(root: Path, config: Dict[str, str]):
-    marker = root / MARKER_NAME
+        # templates 统一放在 templates/joinmenu-so-nice/<id>/，其余放在 public/joinmenu-so-nice/<id>/
+        for group in ("script", "templates", "styles", "assets"):
+            for rel, file in source[group]:
+                _zip_write_file(zf, file, theme_target(rel, safe_id))
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(ZIP_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_theme_files(root: Path) -> Dict[str, Tuple[int, int]]:
+    result: Dict[str, Tuple[int, int]] = {}
+    stack = [root / rel for rel in THEME_DIRS]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file():
+                stat = entry.stat()
+                rel = Path(entry.path).relative_to(root).as_posix()
+                result[rel] = (stat.st_size, stat.st_mtime_ns)
+    return result
+
+
+def hash_theme_files(
+    root: Path,
+    workers: int = HASH_WORKERS,
+    cache_path: Optional[Path] = None,
+) -> Dict[str, Dict[str, object]]:
+    """
+    计算 joinmenu-so-nice/ 下所有主题文件的 SHA-256，返回 {相对路径: {"sha256", "size"}}。
+    (size, mtime) 未变的文件直接复用哈希缓存中的结果，其余文件在线程池中重新计算。
+    缓存默认位于根目录下，此时调用方应持有 lock_root；缓存写入失败（如根目录只读）不影响结果。
+    """
+    if cache_path is None:
+        cache_path = root / HASH_CACHE_NAME
+    try:
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    except Exception:
+        cache = {}
+    stats = _stat_theme_files(root)
+    todo = [
+        rel for rel, (size, mtime_ns) in stats.items()
+        if cache.get(rel, {}).get("size") != size or cache.get(rel, {}).get("mtime_ns") != mtime_ns
+    ]
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = dict(zip(todo, pool.map(lambda rel: _file_sha256(root / rel), todo)))
+    else:
+        digests = {}
+    new_cache = {
+        rel: {"size": size, "mtime_ns": mtime_ns, "sha256": digests.get(rel) or cache[rel]["sha256"]}
+        for rel, (size, mtime_ns) in sorted(stats.items())
+    }
+    if new_cache != cache:
+        tmp = cache_path.with_name(cache_path.name + ".tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(new_cache, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, cache_path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    return {rel: {"sha256": entry["sha256"], "size": entry["size"]} for rel, entry in new_cache.items()}
+
+
+def marker_text(config: Dict[str, str], manifest: Optional[Dict[str, Dict[str, object]]] = None) -> str:
     data = {
         "tool_version": config.get("version", "unknown"),
         "installed_at": datetime.utcnow().isoformat() + "Z",
         "themes": config.get("default_themes", []),
     }
-    marker.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if manifest is not None:
+        data["manifest"] = manifest
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def write_marker(root: Path, config: Dict[str, str], manifest: Optional[Dict[str, Dict[str, object]]] = None):
+    marker = root / MARKER_NAME
+    marker.write_text(marker_text(config, manifest), encoding="utf-8")
+
+
+def refresh_manifest(root: Path):
+    """主题文件经本工具有意修改后，重新记录标记中的文件清单；未安装框架时不做任何事。"""
+    with lock_root(root):
+        info = read_marker(root)
+        if info is None:
+            return
+        info["manifest"] = hash_theme_files(root)
+        commit_files(root, [(root / MARKER_NAME, json.dumps(info, ensure_ascii=False, indent=2))])
 
 
 def read_marker(root: Path) -> Optional[Dict[str, str]]:
@@ -471,25 +940,33 @@ def read_marker(root: Path) -> Optional[Dict[str, str]]:
         return None
 def remove_theme(root: Path, theme_id: str):
     safe_id = validate_theme_id(theme_id)
-    tpl_dir = root / "templates/joinmenu-so-nice" / safe_id
-    pub_dir = root / "public/joinmenu-so-nice" / safe_id
-    if tpl_dir.exists():
-        shutil.rmtree(tpl_dir)
-    if pub_dir.exists():
-        shutil.rmtree(pub_dir)
-
-    foundry_path = find_foundry_file(root)
-    constants_path = find_constants_file(root)
-
-    for path in (foundry_path, constants_path):
-        backup(path)
-        content = path.read_text(encoding="utf-8")
-        match = WORLD_PATTERN.search(content)
-        if not match:
-            continue
-        mapping = load_mapping(match.group(2))
-        if theme_id in mapping:
-            del mapping[theme_id]
-            block = dump_mapping(mapping)
-            content = content[:match.start(2)] + block[1:-1] + content[match.end(2):]
-            path.write_text(content, encoding="utf-8")
+    with lock_root(root):
+        tpl_dir = root / "templates/joinmenu-so-nice" / safe_id
+        pub_dir = root / "public/joinmenu-so-nice" / safe_id
+        if tpl_dir.exists():
+            shutil.rmtree(tpl_dir)
+        if pub_dir.exists():
+            shutil.rmtree(pub_dir)
+
+        foundry_path = find_foundry_file(root)
+        constants_path = find_constants_file(root)
+
+        outputs = []
+        for path in (foundry_path, constants_path):
+            backup(path)
+            original = content = path.read_text(encoding="utf-8")
+            # JOIN_THEME_SCRIPTS 只存在于 foundry.mjs，一并清理，避免留下指向已删除脚本的条目
+            for pattern in (WORLD_PATTERN, SCRIPT_PATTERN):
+                match = pattern.search(content)
+                if not match:
+                    continue
+                mapping = load_mapping(match.group(2))
+                if theme_id in mapping:
+                    del mapping[theme_id]
+                    block = dump_mapping(mapping)
+                    content = content[:match.start(2)] + block[1:-1] + content[match.end(2):]
+            if content != original:
+                outputs.append((path, content))
+        if outputs:
+            commit_files(root, outputs)
+        refresh_manifest(root)
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from . import core
+
+POLL_INTERVAL = 0.25
+DEBOUNCE_SECONDS = 0.3
+RELOAD_PORT = 35729
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# 开启 --reload 时，同步到根目录的 joinmenu.js 会带上这段客户端：每次登录页加载主题脚本都会重新连接，
+# 因此刷新之后依然有效。监视结束时会换回未包装的脚本。
+RELOAD_CLIENT = (
+    "try { if ( !globalThis.__joinThemeReload ) { "
+    "globalThis.__joinThemeReload = new WebSocket(\"ws://127.0.0.1:%d\"); "
+    "globalThis.__joinThemeReload.onmessage = () => window.location.reload(); } } "
+    "catch (err) { console.warn(\"Join theme reload client failed\", err); }"
+)
+
+
+def wrap_reload_client(source: str, port: int) -> str:
+    """
+    把刷新客户端包进主题脚本。JOIN_VIEW_BLOCK 以 Function("return " + source) 加载脚本，
+    所以包装后仍是单个表达式，内部同样以 "return " + source 取得主题类。
+    """
+    return "(() => {\n  " + RELOAD_CLIENT % port + "\n  return " + source + "\n})()"
+
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def snapshot_source(source_dir: Path) -> Snapshot:
+    """记录源目录内每个文件的 (mtime_ns, size)，用于轮询比对；遵循 .themeignore。"""
+    result: Snapshot = {}
+    for rel, entry in core.walk_theme_source(source_dir):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        result[rel] = (stat.st_mtime_ns, stat.st_size)
+    return result
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> Tuple[set, set]:
+    changed = {rel for rel, stamp in new.items() if old.get(rel) != stamp}
+    removed = set(old) - set(new)
+    return changed, removed
+
+
+def read_theme_meta(source_dir: Path, theme_id: str) -> Dict[str, str]:
+    """读取源目录中的 theme.json（若存在），缺少的字段按 pack_external_theme 的默认值、以最终的主题 ID 生成。"""
+    data: Dict[str, object] = {}
+    meta_path = source_dir / "theme.json"
+    if meta_path.exists():
+        try:
+            data = json.loads(meta_path.read_text(encoding="utf-8"))
+        except Exception:
+            data = {}
+    safe_id = core.validate_theme_id(str(data.get("id") or theme_id))
+    return {
+        "id": safe_id,
+        "label": str(data.get("label") or safe_id.title()),
+        "script": str(data.get("script") or f"joinmenu-so-nice/{safe_id}/joinmenu.js"),
+    }
+
+
+def is_theme_registered(root: Path, theme_id: str, script: str) -> bool:
+    try:
+        content = core.find_foundry_file(root).read_text(encoding="utf-8")
+    except (RuntimeError, OSError):
+        return False
+    if "Join theme loader" not in content:
+        return False
+    world = core.WORLD_PATTERN.search(content)
+    scripts = core.SCRIPT_PATTERN.search(content)
+    if not world or not scripts:
+        return False
+    return theme_id in core.load_mapping(world.group(2)) and core.load_mapping(scripts.group(2)).get(theme_id) == script
+
+
+class ReloadServer:
+    """极简 WebSocket 广播服务，仅用于通知浏览器刷新。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = RELOAD_PORT):
+        self.host = host
+        self.port = port
+        self._sock: Optional[socket.socket] = None
+        self._clients: list[socket.socket] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen()
+        self._sock = sock
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    def _accept_loop(self):
+        while self._sock:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            try:
+                self._handshake(conn)
+            except (OSError, ValueError):
+                conn.close()
+                continue
+            with self._lock:
+                self._clients.append(conn)
+
+    @staticmethod
+    def _handshake(conn: socket.socket):
+        conn.settimeout(5)
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ValueError("握手中断")
+            request += chunk
+        key = None
+        for line in request.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        if not key:
+            raise ValueError("缺少 Sec-WebSocket-Key")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        conn.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode("ascii"))
+        conn.settimeout(None)
+
+    def broadcast(self, message: str) -> int:
+        payload = message.encode("utf-8")
+        if len(payload) < 126:
+            header = bytes((0x81, len(payload)))
+        elif len(payload) < 65536:
+            header = bytes((0x81, 126)) + len(payload).to_bytes(2, "big")
+        else:
+            header = bytes((0x81, 127)) + len(payload).to_bytes(8, "big")
+        frame = header + payload
+        sent = 0
+        with self._lock:
+            alive = []
+            for conn in self._clients:
+                try:
+                    conn.sendall(frame)
+                except OSError:
+                    conn.close()
+                    continue
+                alive.append(conn)
+                sent += 1
+            self._clients = alive
+        return sent
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock:
+            sock.close()
+        with self._lock:
+            for conn in self._clients:
+                conn.close()
+            self._clients = []
+
+
+class ThemeWatcher:
+    """监视主题源目录，去抖后只同步变化的文件，必要时才重新为 foundry.mjs 打补丁。"""
+
+    def __init__(
+        self,
+        source_dir: Path,
+        root: Path,
+        theme_id: str,
+        reload_server: Optional[ReloadServer] = None,
+        log: Callable[[str], None] = print,
+        poll_interval: float = POLL_INTERVAL,
+        debounce: float = DEBOUNCE_SECONDS,
+    ):
+        self.source_dir = source_dir
+        self.root = root
+        self.theme_id = theme_id
+        self.reload_server = reload_server
+        self.log = log
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.meta = read_theme_meta(source_dir, theme_id)
+        self._snapshot: Snapshot = {}
+        self._selected: set = set()
+        # 由本次监视注册的主题 ID；只有这些主题会在改名后被清理
+        self._owned: set = set()
+        # 上一轮同步或注册失败时置位，下一轮强制重新检查注册
+        self._needs_register = False
+        self._stop = threading.Event()
+
+    def _target(self, rel: str) -> Optional[Path]:
+        target = core.theme_target(rel, self.meta["id"])
+        return self.root / target if target else None
+
+    def sync_files(self, changed: Iterable[str]) -> int:
+        """
+        按 core.select_theme_sources 的规则从当前快照中挑选文件（与打包一致），复制变化的文件；
+        不再入选的文件（被删除，或因根目录出现同类文件而落选）从目标目录移除。
+        """
+        groups = core.select_theme_sources(self._snapshot)
+        selected = {rel for rels in groups.values() for rel in rels}
+        kept_targets = {self._target(rel) for rel in selected}
+        count = 0
+        for rel in sorted(self._selected - selected):
+            dest = self._target(rel)
+            # 模板平铺后可能与入选文件同名，此时交给下面的复制覆盖
+            if dest is not None and dest not in kept_targets and dest.exists():
+                dest.unlink()
+                count += 1
+        for rel in sorted((set(changed) & selected) | (selected - self._selected)):
+            dest = self._target(rel)
+            if dest is None:
+                continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            self._copy(rel, dest, with_reload=self.reload_server is not None)
+            count += 1
+        self._selected = selected
+        return count
+
+    def _copy(self, rel: str, dest: Path, with_reload: bool):
+        src = self.source_dir / rel
+        if with_reload and core.theme_source_kind(rel) == "script":
+            source = src.read_text(encoding="utf-8")
+            dest.write_text(wrap_reload_client(source, self.reload_server.port), encoding="utf-8")
+            shutil.copystat(src, dest)
+        else:
+            shutil.copy2(src, dest)
+
+    def restore_script(self):
+        """监视结束时把带刷新客户端的 joinmenu.js 换回源文件原样。"""
+        if self.reload_server is None:
+            return
+        for rel in self._selected:
+            if core.theme_source_kind(rel) == "script":
+                with core.lock_root(self.root):
+                    self._copy(rel, self._target(rel), with_reload=False)
+                    core.refresh_manifest(self.root)
+
+    def ensure_registered(self, force: bool = False) -> bool:
+        """仅当主题 ID 或脚本路径变化时才重写 foundry.mjs / constants.mjs。"""
+        meta = read_theme_meta(self.source_dir, self.theme_id)
+        if not force and meta == self.meta:
+            return False
+        old_id = self.meta["id"]
+        self.meta = meta
+        if meta["id"] != old_id:
+            # 主题 ID 变化后旧目标路径已失效，重新全量同步到新目录，再清理旧 ID
+            self.sync_files(self._snapshot)
+            self._drop_theme(old_id)
+        if is_theme_registered(self.root, meta["id"], meta["script"]):
+            return False
+        if meta["id"] not in core.discover_themes(self.root):
+            self._owned.add(meta["id"])
+        core.apply_patches(self.root, {meta["id"]: meta["label"]}, {meta["id"]: meta["script"]})
+        return True
+
+    def _drop_theme(self, theme_id: str):
+        """删除本次监视期间注册的旧主题；监视开始前就已存在的主题只提示，不动用户的文件。"""
+        if theme_id in self._owned:
+            core.remove_theme(self.root, theme_id)
+            self._owned.discard(theme_id)
+            self.log(f"主题 ID 已改为 {self.meta['id']}，已移除旧主题 {theme_id} 的文件与注册")
+        else:
+            self.log(
+                f"主题 ID 已改为 {self.meta['id']}，旧主题 {theme_id} 在监视前已安装，"
+                "其 templates/、public/ 目录与 WORLD_JOIN_THEMES 条目已保留"
+            )
+
+    def initial_sync(self):
+        started = time.perf_counter()
+        self._snapshot = snapshot_source(self.source_dir)
+        with core.lock_root(self.root):
+            count = self.sync_files(self._snapshot)
+            patched = self.ensure_registered(force=True)
+            if not patched:
+                core.refresh_manifest(self.root)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.log(f"初始同步 {count} 个文件，耗时 {elapsed:.0f} ms{'（已打补丁）' if patched else ''}")
+
+    def poll_once(self) -> bool:
+        current = snapshot_source(self.source_dir)
+        changed, removed = diff_snapshots(self._snapshot, current)
+        if not changed and not removed:
+            return False
+        first_seen = time.perf_counter()
+        # 去抖：等待文件系统在 debounce 时间内不再变化
+        while not self._stop.is_set():
+            time.sleep(self.debounce)
+            settled = snapshot_source(self.source_dir)
+            if settled == current:
+                break
+            current = settled
+        changed, removed = diff_snapshots(self._snapshot, current)
+        previous, self._snapshot = self._snapshot, current
+        sync_started = time.perf_counter()
+        try:
+            # 同步与清单刷新放在同一把锁内，避免与 GUI/CLI 的写入交错或哈希到写了一半的文件
+            with core.lock_root(self.root):
+                count = self.sync_files(changed)
+                patched = self.ensure_registered(force=self._needs_register)
+                if count and not patched:
+                    core.refresh_manifest(self.root)
+        except (OSError, RuntimeError) as exc:
+            # 保留旧快照，下一轮会把这些变化视为未同步并重试
+            self._snapshot = previous
+            self._needs_register = True
+            self.log(f"同步失败，将在下一轮重试: {exc}")
+            return False
+        self._needs_register = False
+        finished = time.perf_counter()
+        reloaded = 0
+        if self.reload_server and (count or patched):
+            reloaded = self.reload_server.broadcast(json.dumps({"type": "reload", "files": sorted(changed | removed)}))
+        self.log(
+            f"同步 {count} 个文件: 总延迟 {(finished - first_seen) * 1000:.0f} ms，"
+            f"写入 {(finished - sync_started) * 1000:.0f} ms"
+            f"{'，已重新打补丁' if patched else ''}"
+            f"{f'，已通知 {reloaded} 个页面刷新' if reloaded else ''}"
+        )
+        return True
+
+    def run(self):
+        try:
+            self.initial_sync()
+        except (OSError, RuntimeError) as exc:
+            # 清空快照后，下一轮会把所有文件当作变化重新同步
+            self._snapshot = {}
+            self._needs_register = True
+            self.log(f"初始同步失败，将在下一轮重试: {exc}")
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def watch_theme(
+    source_dir: Path,
+    root: Path,
+    theme_id: str,
+    reload: bool = False,
+    port: int = RELOAD_PORT,
+    log: Callable[[str], None] = print,
+    poll_interval: float = POLL_INTERVAL,
+    debounce: float = DEBOUNCE_SECONDS,
+):
+    # 与打包使用同一套挑选规则，.themeignore 与 node_modules 等目录中的脚本不算数
+    if not core.scan_theme_source(source_dir)["script"]:
+        raise RuntimeError("未找到 joinmenu.js")
+    server = None
+    if reload:
+        server = ReloadServer(port=port)
+        server.start()
+        log(f"刷新服务已启动: ws://127.0.0.1:{port}，监视期间同步的 joinmenu.js 会自动连接")
+    watcher = ThemeWatcher(source_dir, root, theme_id, server, log, poll_interval, debounce)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        log("已停止监视。")
+    finally:
+        watcher.stop()
+        if server:
+            try:
+                watcher.restore_script()
+            except (OSError, RuntimeError) as exc:
+                log(f"恢复 joinmenu.js 失败: {exc}")
+            server.close()
@@ -5,12 +5,35 @@ from typing import Dict
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 
-from . import core
+from . import core, previews, webm
 
 
 FRAMEWORK_THEMES: Dict[str, Dict[str, str]] = {}
 
 
+class PreviewSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(int, str, object, object)
+
+
+class PreviewTask(QtCore.QRunnable):
+    """在线程池中生成单个主题的缩略图与统计信息。"""
+
+    def __init__(self, generation: int, root: Path, theme_id: str, signals: PreviewSignals):
+        super().__init__()
+        self.generation = generation
+        self.root = root
+        self.theme_id = theme_id
+        self.signals = signals
+
+    def run(self):
+        try:
+            summary = previews.theme_summary(self.root, self.theme_id)
+            thumb = previews.build_thumbnail(self.root, self.theme_id)
+        except Exception:
+            summary, thumb = None, None
+        self.signals.finished.emit(self.generation, self.theme_id, thumb, summary)
+
+
 class ThemeInstallerWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -21,6 +44,14 @@ class ThemeInstallerWindow(QtWidgets.QMainWindow):
         self.root_path = Path()
         self.config = core.load_tool_config()
 
+        self.preview_pool = QtCore.QThreadPool(self)
+        self.preview_pool.setMaxThreadCount(2)
+        self.preview_signals = PreviewSignals()
+        self.preview_signals.finished.connect(self.on_preview_ready)
+        self._preview_generation = 0
+        self._preview_requested: set[str] = set()
+        self._theme_items: Dict[str, QtWidgets.QListWidgetItem] = {}
+
         self._build_ui()
         icon_path = self.resource_root / "icon.png"
         if icon_path.exists():
@@ -94,6 +125,13 @@ class ThemeInstallerWindow(QtWidgets.QMainWindow):
 
         # theme list
         self.theme_list = QtWidgets.QListWidget()
+        self.theme_list.setIconSize(QtCore.QSize(previews.THUMBNAIL_WIDTH, previews.THUMBNAIL_HEIGHT))
+        self.theme_list.setUniformItemSizes(True)
+        self.preview_timer = QtCore.QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(60)
+        self.preview_timer.timeout.connect(self.request_visible_previews)
+        self.theme_list.verticalScrollBar().valueChanged.connect(lambda _: self.preview_timer.start())
         layout.addWidget(QtWidgets.QLabel("已安装主题:"))
         layout.addWidget(self.theme_list, 1)
 
@@ -129,6 +167,9 @@ class ThemeInstallerWindow(QtWidgets.QMainWindow):
 
     def refresh_theme_list(self):
         self.theme_list.clear()
+        self._theme_items = {}
+        self._preview_requested = set()
+        self._preview_generation += 1
         path = Path(self.path_combo.currentText().strip())
         if not path.exists():
             return
@@ -136,10 +177,60 @@ class ThemeInstallerWindow(QtWidgets.QMainWindow):
         for key, label in mapping.items():
             if key in ("default", "minimal"):
                 continue
-            item = QtWidgets.QListWidgetItem(f"{key}  —  {label}")
+            item = QtWidgets.QListWidgetItem(f"{key}  —  {label}\n…")
             item.setData(QtCore.Qt.ItemDataRole.UserRole, key)
+            item.setData(QtCore.Qt.ItemDataRole.UserRole + 1, label)
             self.theme_list.addItem(item)
+            self._theme_items[key] = item
         self.update_marker_status()
+        self.preview_timer.start()
+
+    def _refresh_and_select(self, theme_id: str):
+        """重新统计主题列表（大小、视频数量与封面），并保持原来的选中项。"""
+        self.refresh_theme_list()
+        item = self._theme_items.get(theme_id)
+        if item is not None:
+            self.theme_list.setCurrentItem(item)
+
+    def resizeEvent(self, event: QtGui.QResizeEvent):
+        super().resizeEvent(event)
+        self.preview_timer.start()
+
+    def request_visible_previews(self):
+        """只为当前可见的行排队生成预览，已请求过的不再重复。"""
+        count = self.theme_list.count()
+        if not count:
+            return
+        viewport = self.theme_list.viewport()
+        first = self.theme_list.indexAt(QtCore.QPoint(1, 1)).row()
+        last = self.theme_list.indexAt(QtCore.QPoint(1, viewport.height() - 1)).row()
+        first = max(first, 0)
+        last = count - 1 if last < 0 else last
+        root = Path(self.path_combo.currentText().strip())
+        for row in range(first, last + 1):
+            key = self.theme_list.item(row).data(QtCore.Qt.ItemDataRole.UserRole)
+            if key in self._preview_requested:
+                continue
+            self._preview_requested.add(key)
+            self.preview_pool.start(PreviewTask(self._preview_generation, root, key, self.preview_signals))
+
+    def on_preview_ready(self, generation: int, theme_id: str, thumb, summary):
+        if generation != self._preview_generation:
+            return
+        item = self._theme_items.get(theme_id)
+        if item is None:
+            return
+        label = item.data(QtCore.Qt.ItemDataRole.UserRole + 1)
+        if summary:
+            details = (
+                f"{core.format_size(summary['bytes'])} · {summary['files']} 个文件 · "
+                f"图片 {summary['images']} / 视频 {summary['videos']} / 字体 {summary['fonts']}"
+            )
+        else:
+            details = "无法读取主题文件"
+        item.setText(f"{theme_id}  —  {label}\n{details}")
+        if thumb:
+            item.setIcon(QtGui.QIcon(str(thumb)))
 
     def update_marker_status(self):
         if not self.root_path or not self.root_path.exists():
@@ -284,10 +375,28 @@ class ThemeInstallerWindow(QtWidgets.QMainWindow):
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "选择 WebM 视频", filter="WebM Files (*.webm)")
         if not file_path:
             return
+        budget = self.config.get("webm_budget")
+        try:
+            checked = core.check_background_video(Path(file_path), budget)
+            verdict, reasons, report = checked
+        except Exception as exc:
+            QtWidgets.QMessageBox.critical(self, "错误", f"无法解析该视频: {exc}")
+            self.log(f"视频检测失败: {exc}")
+            return
+        summary = webm.describe_report(report)
+        self.log(f"视频检测 ({verdict}): {summary}")
+        if verdict == "refuse":
+            QtWidgets.QMessageBox.critical(self, "视频不满足快速起播要求", summary + "\n\n" + "\n".join(reasons))
+            return
+        if verdict == "warn":
+            question = f"{summary}\n\n" + "\n".join(reasons) + "\n\n登录页背景可能加载缓慢，是否仍然使用？"
+            if QtWidgets.QMessageBox.question(self, "视频检测警告", question) != QtWidgets.QMessageBox.StandardButton.Yes:
+                return
         try:
-            dest = core.set_theme_background_video(root, theme_id, Path(file_path))
+            dest = core.set_theme_background_video(root, theme_id, Path(file_path), budget, checked)
             self.log(f"已为 {theme_id} 设置背景视频: {dest}")
-            QtWidgets.QMessageBox.information(self, "完成", f"背景视频已复制到 {dest}")
+            self._refresh_and_select(theme_id)
+            QtWidgets.QMessageBox.information(self, "完成", f"背景视频已复制到 {dest}\n{summary}")
         except Exception as exc:
             QtWidgets.QMessageBox.critical(self, "错误", str(exc))
             self.log(f"背景视频设置失败: {exc}")
@@ -307,6 +416,7 @@ class ThemeInstallerWindow(QtWidgets.QMainWindow):
         try:
             dest = core.remove_theme_background_video(root, theme_id)
             self.log(f"已移除 {theme_id} 的背景视频: {dest}")
+            self._refresh_and_select(theme_id)
             QtWidgets.QMessageBox.information(self, "完成", f"已删除 {dest}")
         except FileNotFoundError:
             QtWidgets.QMessageBox.information(self, "提示", "该主题未附加背景视频。")
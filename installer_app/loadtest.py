@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import http.client
+import math
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+from . import core
+
+DEFAULT_CLIENTS = 30
+VIDEO_CHUNK = 1024 * 1024
+VIDEO_BUDGET = 4 * 1024 * 1024
+CONTENT_TYPES = {
+    ".js": "text/javascript",
+    ".mjs": "text/javascript",
+    ".css": "text/css",
+    ".hbs": "text/x-handlebars-template",
+    ".html": "text/html",
+    ".json": "application/json",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".svg": "image/svg+xml",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".webm": "video/webm",
+    ".mp4": "video/mp4",
+}
+
+TEMPLATE_REF_PATTERN = re.compile(r"template\s*:\s*[\"'`]([^\"'`]+?\.hbs)[\"'`]")
+CSS_REF_PATTERN = re.compile(r"[\"'`]([^\"'`\s]+?\.css)[\"'`]")
+CSS_URL_PATTERN = re.compile(r"url\(\s*[\"']?([^\"')]+?)[\"']?\s*\)|@import\s+[\"']([^\"']+)[\"']")
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+Request = Tuple[str, str, Optional[str]]
+
+
+class StaticFoundryHandler(BaseHTTPRequestHandler):
+    """模拟 Foundry 的静态路由：/templates/* 取自 templates/，其余取自 public/，支持单段 Range。"""
+
+    protocol_version = "HTTP/1.1"
+    server: "StaticFoundryServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _resolve(self) -> Optional[Path]:
+        path = unquote(urlsplit(self.path).path).lstrip("/")
+        if path.startswith("templates/"):
+            base = self.server.root / "templates"
+            path = path[len("templates/"):]
+        else:
+            base = self.server.root / "public"
+        target = (base / path).resolve()
+        if base.resolve() not in target.parents or not target.is_file():
+            return None
+        return target
+
+    def _send_empty(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        target = self._resolve()
+        if target is None:
+            self._send_empty(404)
+            return
+        size = target.stat().st_size
+        start, end = 0, size - 1
+        status = 200
+        header = self.headers.get("Range")
+        if header:
+            match = RANGE_PATTERN.match(header.strip())
+            if not match or (not match.group(1) and not match.group(2)):
+                self._send_empty(416)
+                return
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        length = end - start + 1 if size else 0
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES.get(target.suffix.lower(), "application/octet-stream"))
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        # 在发送正文前计数：客户端读完响应时统计已经到位，run_load_test 读取的总量不会漏掉最后几个请求
+        self.server.record(length)
+        with target.open("rb") as fh:
+            fh.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = fh.read(min(core.ZIP_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+class StaticFoundryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, root: Path, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), StaticFoundryHandler)
+        self.root = root
+        self.bytes_served = 0
+        self.requests_served = 0
+        self._stats_lock = threading.Lock()
+
+    def record(self, length: int):
+        with self._stats_lock:
+            self.bytes_served += length
+            self.requests_served += 1
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.bytes_served = 0
+            self.requests_served = 0
+
+
+def _public_file(root: Path, url: str) -> Path:
+    path = url.lstrip("/")
+    if path.startswith("templates/"):
+        return root / path
+    return root / "public" / path
+
+
+def _css_references(root: Path, css_url: str, seen: set) -> Iterable[Request]:
+    css_path = _public_file(root, css_url)
+    if not css_path.is_file():
+        return
+    text = css_path.read_text(encoding="utf-8", errors="replace")
+    for match in CSS_URL_PATTERN.finditer(text):
+        ref = (match.group(1) or match.group(2) or "").strip()
+        if not ref or ref.startswith(("data:", "http:", "https:", "//", "#")):
+            continue
+        url = urlsplit(urljoin(css_url, ref)).path
+        if url in seen:
+            continue
+        seen.add(url)
+        if url.endswith(".css"):
+            yield ("css", url, None)
+            yield from _css_references(root, url, seen)
+        else:
+            kind = "font" if Path(url).suffix.lower() in core.FONT_SUFFIXES else "asset"
+            yield (kind, url, None)
+
+
+def build_request_chain(
+    root: Path,
+    theme_id: str,
+    video_chunk: int = VIDEO_CHUNK,
+    video_budget: int = VIDEO_BUDGET,
+) -> List[Request]:
+    """
+    复现 JOIN_VIEW_BLOCK 与主题 joinmenu.js 触发的请求序列：
+    脚本 -> PARTS 模板 -> 注入的 CSS -> CSS 引用的字体/图片 -> background.webm 的 Range 请求。
+    """
+    safe_id = core.validate_theme_id(theme_id)
+    script = core.discover_theme_scripts(root).get(safe_id, f"joinmenu-so-nice/{safe_id}/joinmenu.js")
+    script_url = "/" + script.lstrip("/")
+    chain: List[Request] = [("script", script_url, None)]
+    script_path = _public_file(root, script_url)
+    if not script_path.is_file():
+        raise RuntimeError(f"未找到主题脚本: {script_path}")
+    source = script_path.read_text(encoding="utf-8", errors="replace")
+
+    seen = {script_url}
+    for match in TEMPLATE_REF_PATTERN.finditer(source):
+        url = "/" + match.group(1).lstrip("/")
+        if url not in seen:
+            seen.add(url)
+            chain.append(("template", url, None))
+    for match in CSS_REF_PATTERN.finditer(source):
+        url = "/" + match.group(1).lstrip("/")
+        if url not in seen:
+            seen.add(url)
+            chain.append(("css", url, None))
+            chain.extend(_css_references(root, url, seen))
+
+    video_url = f"/joinmenu-so-nice/{safe_id}/background.webm"
+    video_path = _public_file(root, video_url)
+    if video_path.is_file():
+        total = min(video_path.stat().st_size, video_budget)
+        for start in range(0, total, video_chunk):
+            end = min(start + video_chunk, total) - 1
+            chain.append(("video", video_url, f"bytes={start}-{end}"))
+    return chain
+
+
+def _run_client(host: str, port: int, chain: List[Request], barrier: threading.Barrier) -> List[Dict[str, object]]:
+    samples = []
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        barrier.wait()
+        for kind, url, byte_range in chain:
+            headers = {"Range": byte_range} if byte_range else {}
+            started = time.perf_counter()
+            try:
+                conn.request("GET", url, headers=headers)
+                response = conn.getresponse()
+                size = len(response.read())
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+                size, status = 0, 0
+            samples.append({
+                "kind": kind,
+                "url": url,
+                "status": status,
+                "bytes": size,
+                "latency": time.perf_counter() - started,
+            })
+    finally:
+        conn.close()
+    return samples
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summarize(samples: List[Dict[str, object]]) -> Dict[str, object]:
+    latencies = [float(s["latency"]) for s in samples]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s["status"] not in (200, 206)),
+        "bytes": sum(int(s["bytes"]) for s in samples),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def run_load_test(
+    root: Path,
+    theme_id: str,
+    clients: int = DEFAULT_CLIENTS,
+    video_chunk: int = VIDEO_CHUNK,
+    video_budget: int = VIDEO_BUDGET,
+    server: Optional[StaticFoundryServer] = None,
+) -> Dict[str, object]:
+    """N 个客户端同时（Barrier 对齐）请求完整的登录页资源链，返回整体与按类型的延迟分位数。"""
+    if clients < 1:
+        raise ValueError("客户端数量至少为 1。")
+    chain = build_request_chain(root, theme_id, video_chunk, video_budget)
+    own_server = server is None
+    if own_server:
+        server = StaticFoundryServer(root)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    server.reset_stats()
+    barrier = threading.Barrier(clients)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            futures = [pool.submit(_run_client, host, port, chain, barrier) for _ in range(clients)]
+            samples = [sample for future in futures for sample in future.result()]
+        wall = time.perf_counter() - started
+    finally:
+        if own_server:
+            server.shutdown()
+            server.server_close()
+    kinds: Dict[str, List[Dict[str, object]]] = {}
+    for sample in samples:
+        kinds.setdefault(str(sample["kind"]), []).append(sample)
+    return {
+        "theme": theme_id,
+        "clients": clients,
+        "chain_length": len(chain),
+        "wall": wall,
+        "bytes_served": server.bytes_served,
+        "total": _summarize(samples),
+        "kinds": {kind: _summarize(items) for kind, items in kinds.items()},
+    }
+
+
+def _failed_result(theme_id: str, clients: int, error: str) -> Dict[str, object]:
+    return {
+        "theme": theme_id,
+        "clients": clients,
+        "chain_length": 0,
+        "wall": 0.0,
+        "bytes_served": 0,
+        "total": _summarize([]),
+        "kinds": {},
+        "error": error,
+    }
+
+
+def compare_themes(root: Path, theme_ids: Iterable[str], clients: int = DEFAULT_CLIENTS, **kwargs) -> List[Dict[str, object]]:
+    """依次压测各主题；单个主题无法测试（如缺少脚本）时记为失败行，不影响其余主题。"""
+    server = StaticFoundryServer(root)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+    try:
+        for theme_id in theme_ids:
+            try:
+                results.append(run_load_test(root, theme_id, clients, server=server, **kwargs))
+            except (RuntimeError, OSError) as exc:
+                results.append(_failed_result(theme_id, clients, str(exc)))
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def format_report(results: List[Dict[str, object]]) -> str:
+    rows = [("主题", "类型", "请求数", "错误", "传输量", "p50 ms", "p95 ms", "p99 ms")]
+    for result in results:
+        if result.get("error"):
+            rows.append((str(result["theme"]), "全部", "0", "失败", "-", "-", "-", "-"))
+            continue
+        sections = [("全部", result["total"])] + sorted(result["kinds"].items())
+        for kind, stats in sections:
+            rows.append((
+                str(result["theme"]),
+                kind,
+                str(stats["requests"]),
+                str(stats["errors"]),
+                core.format_size(int(stats["bytes"])),
+                f"{stats['p50'] * 1000:.1f}",
+                f"{stats['p95'] * 1000:.1f}",
+                f"{stats['p99'] * 1000:.1f}",
+            ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)) for row in rows]
+    lines.insert(1, "-" * min(shutil.get_terminal_size().columns, len(lines[0])))
+    for result in results:
+        if result.get("error"):
+            lines.append(f"{result['theme']}: 测试失败: {result['error']}")
+            continue
+        lines.append(
+            f"{result['theme']}: {result['clients']} 个客户端 × {result['chain_length']} 个请求，"
+            f"耗时 {result['wall']:.2f} s，服务端共发送 {core.format_size(int(result['bytes_served']))}"
+        )
+    return "\n".join(lines)
+
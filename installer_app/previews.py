@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PyQt6 import QtCore, QtGui
+
+from . import core
+
+THUMBNAIL_WIDTH = 96
+THUMBNAIL_HEIGHT = 54
+CACHE_DIR = Path(__file__).parent / "cache" / "thumbnails"
+HASH_INDEX_NAME = "index.json"
+HERO_STEMS = ("hero", "preview", "cover", "poster", "background", "bg")
+POSTER_TIMEOUT = 20
+
+_index_lock = threading.Lock()
+_hash_index: Optional[Dict[str, Dict[str, object]]] = None
+
+
+def _theme_dirs(root: Path, theme_id: str) -> Tuple[Path, Path]:
+    safe_id = core.validate_theme_id(theme_id)
+    return root / "templates/joinmenu-so-nice" / safe_id, root / "public/joinmenu-so-nice" / safe_id
+
+
+def theme_summary(root: Path, theme_id: str) -> Dict[str, int]:
+    """统计主题文件数、总大小及图片/视频/字体数量。"""
+    summary = {"files": 0, "bytes": 0, "images": 0, "videos": 0, "fonts": 0}
+    stack = [d for d in _theme_dirs(root, theme_id) if d.exists()]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+                continue
+            suffix = os.path.splitext(entry.name)[1].lower()
+            summary["files"] += 1
+            summary["bytes"] += entry.stat().st_size
+            if suffix in core.IMAGE_SUFFIXES:
+                summary["images"] += 1
+            elif suffix in core.MEDIA_SUFFIXES:
+                summary["videos"] += 1
+            elif suffix in core.FONT_SUFFIXES:
+                summary["fonts"] += 1
+    return summary
+
+
+def find_preview_source(root: Path, theme_id: str) -> Optional[Tuple[Path, str]]:
+    """优先选择命名为 hero/preview/background 等的图片，其次任意图片，最后 background.webm。"""
+    _, pub_dir = _theme_dirs(root, theme_id)
+    if not pub_dir.exists():
+        return None
+    images = sorted(
+        p for p in pub_dir.rglob("*")
+        if p.is_file() and p.suffix.lower() in core.IMAGE_SUFFIXES - {".svg", ".ico"}
+    )
+    for stem in HERO_STEMS:
+        for image in images:
+            if image.stem.lower() == stem:
+                return image, "image"
+    if images:
+        return images[0], "image"
+    video = pub_dir / "background.webm"
+    if video.exists():
+        return video, "video"
+    return None
+
+
+def _load_index() -> Dict[str, Dict[str, object]]:
+    global _hash_index
+    if _hash_index is None:
+        index_path = CACHE_DIR / HASH_INDEX_NAME
+        try:
+            _hash_index = json.loads(index_path.read_text(encoding="utf-8"))
+        except Exception:
+            _hash_index = {}
+    return _hash_index
+
+
+def _save_index():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    index_path = CACHE_DIR / HASH_INDEX_NAME
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    tmp.write_text(json.dumps(_hash_index, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, index_path)
+
+
+def _fresh_entry(path: Path, stat: os.stat_result) -> Optional[Dict[str, object]]:
+    """返回索引中与当前 (size, mtime) 一致的记录；调用方需持有 _index_lock。"""
+    cached = _load_index().get(str(path.resolve()))
+    if cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+        return cached
+    return None
+
+
+def file_digest(path: Path) -> str:
+    """计算文件 SHA-1；(size, mtime) 未变化时直接复用索引中的结果，避免重复读取大视频。"""
+    stat = path.stat()
+    with _index_lock:
+        cached = _fresh_entry(path, stat)
+        if cached and cached.get("sha1"):
+            return str(cached["sha1"])
+    digest = hashlib.sha1()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(core.ZIP_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _index_lock:
+        _load_index()[str(path.resolve())] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": value}
+        _save_index()
+    return value
+
+
+def _known_unusable(path: Path) -> bool:
+    stat = path.stat()
+    with _index_lock:
+        cached = _fresh_entry(path, stat)
+        return bool(cached and cached.get("unusable"))
+
+
+def _mark_unusable(path: Path):
+    """记录该文件无法生成缩略图（无法解码或截不到帧），文件不变时不再重试。"""
+    stat = path.stat()
+    with _index_lock:
+        entry = _fresh_entry(path, stat) or {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        entry["unusable"] = True
+        _load_index()[str(path.resolve())] = entry
+        _save_index()
+
+
+def extract_poster_frame(video: Path, dest: Path) -> bool:
+    """借助 ffmpeg（若可用）截取一帧作为封面；没有解码器时返回 False。"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    cmd = [ffmpeg, "-v", "error", "-y", "-ss", "1", "-i", str(video), "-frames:v", "1", str(dest)]
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    try:
+        subprocess.run(cmd, check=True, timeout=POSTER_TIMEOUT, capture_output=True, **kwargs)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return dest.exists()
+
+
+def _save_scaled(source: Path, dest: Path) -> bool:
+    image = QtGui.QImage(str(source))
+    if image.isNull():
+        return False
+    scaled = image.scaled(
+        THUMBNAIL_WIDTH,
+        THUMBNAIL_HEIGHT,
+        QtCore.Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+        QtCore.Qt.TransformationMode.SmoothTransformation,
+    )
+    x = max(0, (scaled.width() - THUMBNAIL_WIDTH) // 2)
+    y = max(0, (scaled.height() - THUMBNAIL_HEIGHT) // 2)
+    cropped = scaled.copy(x, y, THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.stem + ".tmp.png")
+    if not cropped.save(str(tmp), "PNG"):
+        return False
+    os.replace(tmp, dest)
+    return True
+
+
+def build_thumbnail(root: Path, theme_id: str) -> Optional[Path]:
+    """返回缓存中的缩略图路径（按源文件哈希命名），必要时生成。可在非 UI 线程调用。"""
+    found = find_preview_source(root, theme_id)
+    if not found:
+        return None
+    source, kind = found
+    # 没有 ffmpeg 或此前已确认无法截帧时，不必为了缓存键去读取整个视频
+    if kind == "video" and not shutil.which("ffmpeg"):
+        return None
+    if _known_unusable(source):
+        return None
+    cached = CACHE_DIR / f"{file_digest(source)}.png"
+    if cached.exists():
+        return cached
+    if kind == "image":
+        if _save_scaled(source, cached):
+            return cached
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            frame = Path(tmpdir) / "frame.png"
+            if extract_poster_frame(source, frame) and _save_scaled(frame, cached):
+                return cached
+    _mark_unusable(source)
+    return None
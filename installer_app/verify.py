@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from . import core
+
+FLEET_WORKERS = 4
+# 校验只读取根目录；哈希缓存放在工具自己的缓存目录，按根目录路径区分
+CACHE_DIR = Path(__file__).parent / "cache" / "verify"
+
+
+def _cache_path(root: Path) -> Path:
+    key = hashlib.sha1(str(root.resolve()).encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{key}.json"
+
+
+def _check_bundles(root: Path, issues: List[str]) -> Dict[str, str]:
+    try:
+        foundry_path = core.find_foundry_file(root)
+        constants_path = core.find_constants_file(root)
+    except RuntimeError as exc:
+        issues.append(str(exc))
+        return {}
+    foundry = foundry_path.read_text(encoding="utf-8")
+    constants = constants_path.read_text(encoding="utf-8")
+
+    world_front = core.WORLD_PATTERN.search(foundry)
+    world_back = core.WORLD_PATTERN.search(constants)
+    scripts = core.SCRIPT_PATTERN.search(foundry)
+    if not world_front:
+        issues.append("foundry.mjs 缺少 WORLD_JOIN_THEMES")
+    if not world_back:
+        issues.append("constants.mjs 缺少 WORLD_JOIN_THEMES")
+    if not scripts:
+        issues.append("foundry.mjs 缺少 JOIN_THEME_SCRIPTS（补丁可能已被 Foundry 更新覆盖）")
+    if "Join theme loader" not in foundry or not core.JOIN_VIEW_HEADER_PATTERN.search(foundry):
+        issues.append("#joinView 未包含 Join theme loader 补丁")
+    if not (world_front and world_back):
+        return {}
+
+    front = core.load_mapping(world_front.group(2))
+    back = core.load_mapping(world_back.group(2))
+    script_map = core.load_mapping(scripts.group(2)) if scripts else {}
+    if front != back:
+        only_front = sorted(set(front) - set(back))
+        only_back = sorted(set(back) - set(front))
+        issues.append(
+            "WORLD_JOIN_THEMES 不一致"
+            + (f"，仅 foundry.mjs: {', '.join(only_front)}" if only_front else "")
+            + (f"，仅 constants.mjs: {', '.join(only_back)}" if only_back else "")
+        )
+    for key, script in script_map.items():
+        if key not in front:
+            issues.append(f"JOIN_THEME_SCRIPTS 中的 {key} 未在 WORLD_JOIN_THEMES 注册")
+        if not (root / "public" / script).is_file():
+            issues.append(f"主题 {key} 的脚本不存在: public/{script}")
+    for key in front:
+        if scripts and key not in ("default", "minimal") and key not in script_map:
+            issues.append(f"主题 {key} 缺少 JOIN_THEME_SCRIPTS 条目")
+    return front
+
+
+def verify_root(root: Path, workers: int = core.HASH_WORKERS) -> Dict[str, object]:
+    """
+    校验单个根目录：两个 bundle 的主题注册与 #joinView 补丁是否一致，
+    以及 joinmenu-so-nice/ 下的文件是否与标记中记录的清单相符。
+    """
+    issues: List[str] = []
+    result: Dict[str, object] = {"root": str(root), "issues": issues, "modified": [], "missing": [], "extra": []}
+    if not root.exists():
+        issues.append("目录不存在")
+        result["ok"] = False
+        return result
+
+    result["themes"] = sorted(k for k in _check_bundles(root, issues) if k not in ("default", "minimal"))
+
+    marker = core.read_marker(root)
+    if marker is None:
+        issues.append("缺少 .join-theme-framework.json 标记")
+    elif "manifest" not in marker:
+        issues.append("标记中没有文件清单，请重新安装框架以记录清单")
+    else:
+        expected = marker["manifest"]
+        actual = core.hash_theme_files(root, workers, _cache_path(root))
+        result["files"] = len(actual)
+        result["missing"] = sorted(set(expected) - set(actual))
+        result["extra"] = sorted(set(actual) - set(expected))
+        result["modified"] = sorted(
+            rel for rel in set(expected) & set(actual)
+            if expected[rel].get("sha256") != actual[rel]["sha256"]
+        )
+        for key, label in (("missing", "缺失"), ("modified", "被修改"), ("extra", "多出")):
+            if result[key]:
+                issues.append(f"{len(result[key])} 个主题文件{label}")
+    result["ok"] = not issues
+    return result
+
+
+def verify_fleet(roots: Iterable[Path], workers: int = FLEET_WORKERS) -> List[Dict[str, object]]:
+    roots = list(roots)
+
+    def run(root: Path) -> Dict[str, object]:
+        try:
+            return verify_root(root)
+        except Exception as exc:
+            return {"root": str(root), "ok": False, "issues": [f"校验失败: {exc}"], "modified": [], "missing": [], "extra": []}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(roots)))) as pool:
+        return list(pool.map(run, roots))
+
+
+def format_results(results: List[Dict[str, object]], verbose: bool = False) -> str:
+    lines = []
+    for result in results:
+        status = "OK" if result["ok"] else "DRIFT"
+        files = f"，{result['files']} 个文件" if "files" in result else ""
+        lines.append(f"[{status}] {result['root']}{files}")
+        for issue in result["issues"]:
+            lines.append(f"    - {issue}")
+        if verbose:
+            for key in ("missing", "modified", "extra"):
+                for rel in result[key]:
+                    lines.append(f"        {key}: {rel}")
+    drift = sum(1 for r in results if not r["ok"])
+    lines.append(f"共 {len(results)} 个根目录，{drift} 个存在偏差。")
+    return "\n".join(lines)
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TIME = 0xB3
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+REFERENCE_BLOCK = 0xFB
+LEVEL1_IDS = {SEEK_HEAD, INFO, TRACKS, CUES, CLUSTER, 0x1043A770, 0x1941A469, 0x1254C367}
+
+UNKNOWN_SIZE = -1
+MAX_CLUSTERS = 64
+MAX_METADATA_SIZE = 4 * 1024 * 1024
+
+# warn / refuse 两档预算，可在 config.json 的 "webm_budget" 中覆盖任意字段
+DEFAULT_BUDGET: Dict[str, Dict[str, object]] = {
+    "warn": {
+        "max_bitrate_kbps": 5000,
+        "max_keyframe_interval": 4.0,
+        "max_width": 1920,
+        "max_height": 1080,
+        "max_size_mb": 50,
+        "require_cues_front": True,
+    },
+    "refuse": {
+        "max_bitrate_kbps": 20000,
+        "max_keyframe_interval": 15.0,
+        "max_width": 3840,
+        "max_height": 2160,
+        "max_size_mb": 300,
+        "require_cues_front": False,
+    },
+}
+
+
+class CountingReader:
+    """包装文件对象，统计实际读取的字节数。"""
+
+    def __init__(self, fh: BinaryIO):
+        self.fh = fh
+        self.bytes_read = 0
+
+    def seek(self, pos: int):
+        self.fh.seek(pos)
+
+    def read(self, size: int) -> bytes:
+        data = self.fh.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def _read_vint(reader: CountingReader, keep_marker: bool) -> Tuple[int, int]:
+    first = reader.read(1)
+    if not first:
+        raise EOFError
+    value = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not (value & mask):
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("无效的 EBML 变长整数。")
+    rest = reader.read(length - 1)
+    if len(rest) != length - 1:
+        raise EOFError
+    if not keep_marker:
+        value &= mask - 1
+    all_ones = value == mask - 1
+    for byte in rest:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if not keep_marker and all_ones:
+        return UNKNOWN_SIZE, length
+    return value, length
+
+
+def _read_header(reader: CountingReader, pos: int) -> Tuple[int, int, int]:
+    """返回 (元素 ID, 数据大小, 数据起始偏移)。"""
+    reader.seek(pos)
+    element_id, id_len = _read_vint(reader, keep_marker=True)
+    size, size_len = _read_vint(reader, keep_marker=False)
+    return element_id, size, pos + id_len + size_len
+
+
+def _read_exact(reader: CountingReader, size: int) -> bytes:
+    data = reader.read(size)
+    if len(data) != size:
+        raise EOFError
+    return data
+
+
+def _read_uint(reader: CountingReader, size: int) -> int:
+    if size > 8:
+        raise ValueError("无效的 EBML 整数长度。")
+    return int.from_bytes(_read_exact(reader, size), "big") if size else 0
+
+
+def _read_float(reader: CountingReader, size: int) -> Optional[float]:
+    if size not in (4, 8):
+        return None
+    data = _read_exact(reader, size)
+    return struct.unpack(">f" if size == 4 else ">d", data)[0]
+
+
+def _children(reader: CountingReader, start: int, end: int):
+    pos = start
+    while pos < end:
+        element_id, size, data_start = _read_header(reader, pos)
+        if size == UNKNOWN_SIZE:
+            return
+        yield element_id, size, data_start
+        pos = data_start + size
+
+
+def _parse_seek_head(reader: CountingReader, start: int, end: int, segment_start: int) -> Dict[int, int]:
+    positions: Dict[int, int] = {}
+    for element_id, size, data_start in _children(reader, start, end):
+        if element_id != SEEK:
+            continue
+        seek_id = seek_pos = None
+        for child_id, child_size, child_start in _children(reader, data_start, data_start + size):
+            reader.seek(child_start)
+            if child_id == SEEK_ID:
+                seek_id = _read_uint(reader, child_size)
+            elif child_id == SEEK_POSITION:
+                seek_pos = _read_uint(reader, child_size)
+        if seek_id is not None and seek_pos is not None:
+            positions[seek_id] = segment_start + seek_pos
+    return positions
+
+
+def _parse_video_track(reader: CountingReader, start: int, end: int, report: Dict[str, object]):
+    for element_id, size, data_start in _children(reader, start, end):
+        if element_id != TRACK_ENTRY:
+            continue
+        entry: Dict[str, object] = {}
+        for child_id, child_size, child_start in _children(reader, data_start, data_start + size):
+            reader.seek(child_start)
+            if child_id == TRACK_NUMBER:
+                entry["number"] = _read_uint(reader, child_size)
+            elif child_id == TRACK_TYPE:
+                entry["type"] = _read_uint(reader, child_size)
+            elif child_id == CODEC_ID:
+                entry["codec"] = _read_exact(reader, min(child_size, 64)).decode("ascii", "replace")
+            elif child_id == VIDEO:
+                for video_id, video_size, video_start in _children(reader, child_start, child_start + child_size):
+                    reader.seek(video_start)
+                    if video_id == PIXEL_WIDTH:
+                        entry["width"] = _read_uint(reader, video_size)
+                    elif video_id == PIXEL_HEIGHT:
+                        entry["height"] = _read_uint(reader, video_size)
+        if entry.get("type") == 1:
+            report["video_track"] = entry.get("number")
+            report["codec"] = entry.get("codec")
+            report["width"] = entry.get("width")
+            report["height"] = entry.get("height")
+            return
+
+
+def _parse_cue_times(reader: CountingReader, start: int, end: int) -> List[int]:
+    times = []
+    for element_id, size, data_start in _children(reader, start, end):
+        if element_id != CUE_POINT:
+            continue
+        for child_id, child_size, child_start in _children(reader, data_start, data_start + size):
+            if child_id == CUE_TIME:
+                reader.seek(child_start)
+                times.append(_read_uint(reader, child_size))
+                break
+    return times
+
+
+def _block_header(reader: CountingReader, pos: int) -> Tuple[int, int, int]:
+    reader.seek(pos)
+    track, _ = _read_vint(reader, keep_marker=False)
+    raw = _read_exact(reader, 3)
+    return track, struct.unpack(">h", raw[:2])[0], raw[2]
+
+
+def _scan_clusters(
+    reader: CountingReader,
+    pos: int,
+    segment_end: int,
+    video_track: Optional[int],
+    max_clusters: int,
+) -> Tuple[List[int], int, int]:
+    """只读取簇与块的头部，收集视频轨关键帧时间码；返回 (关键帧, 扫描簇数, 最后时间码)。"""
+    keyframes: List[int] = []
+    scanned = 0
+    last_timecode = 0
+    while pos < segment_end and scanned < max_clusters:
+        try:
+            element_id, size, data_start = _read_header(reader, pos)
+        except EOFError:
+            break
+        if element_id != CLUSTER:
+            if size == UNKNOWN_SIZE:
+                break
+            pos = data_start + size
+            continue
+        scanned += 1
+        end = segment_end if size == UNKNOWN_SIZE else data_start + size
+        cluster_tc = 0
+        child = data_start
+        while child < end:
+            try:
+                child_id, child_size, child_start = _read_header(reader, child)
+            except EOFError:
+                end = child
+                break
+            if child_id in LEVEL1_IDS or child_size == UNKNOWN_SIZE:
+                end = child
+                break
+            if child_id == CLUSTER_TIMECODE:
+                reader.seek(child_start)
+                cluster_tc = _read_uint(reader, child_size)
+            elif child_id == SIMPLE_BLOCK:
+                track, rel_tc, flags = _block_header(reader, child_start)
+                last_timecode = max(last_timecode, cluster_tc + rel_tc)
+                if (video_track is None or track == video_track) and flags & 0x80:
+                    keyframes.append(cluster_tc + rel_tc)
+            elif child_id == BLOCK_GROUP:
+                block = None
+                referenced = False
+                for group_id, _, group_start in _children(reader, child_start, child_start + child_size):
+                    if group_id == BLOCK:
+                        block = group_start
+                    elif group_id == REFERENCE_BLOCK:
+                        referenced = True
+                if block is not None:
+                    track, rel_tc, _ = _block_header(reader, block)
+                    last_timecode = max(last_timecode, cluster_tc + rel_tc)
+                    if (video_track is None or track == video_track) and not referenced:
+                        keyframes.append(cluster_tc + rel_tc)
+            child = child_start + child_size
+        pos = end
+    return keyframes, scanned, last_timecode
+
+
+def analyze_webm(path: Path, max_clusters: int = MAX_CLUSTERS) -> Dict[str, object]:
+    """
+    流式解析 WebM/Matroska 头部，只按需读取元素：
+    时长、分辨率、码率、Cues 位置（是否位于首个 Cluster 之前）以及前若干簇的关键帧间隔。
+    """
+    file_size = path.stat().st_size
+    report: Dict[str, object] = {
+        "size": file_size,
+        "duration": None,
+        "width": None,
+        "height": None,
+        "codec": None,
+        "bitrate_kbps": None,
+        "cues_position": None,
+        "first_cluster_position": None,
+        "cues_before_clusters": None,
+        "keyframe_interval_max": None,
+        "keyframe_interval_avg": None,
+        "keyframes_scanned": 0,
+    }
+    with path.open("rb") as fh:
+        reader = CountingReader(fh)
+        element_id, size, data_start = _read_header(reader, 0)
+        if element_id != EBML_HEADER:
+            raise ValueError("不是有效的 WebM 文件（缺少 EBML 头）。")
+        pos = data_start + size
+        element_id, size, segment_start = _read_header(reader, pos)
+        if element_id != SEGMENT:
+            raise ValueError("WebM 文件缺少 Segment。")
+        segment_end = file_size if size == UNKNOWN_SIZE else min(file_size, segment_start + size)
+
+        timecode_scale = 1_000_000
+        duration_ticks: Optional[float] = None
+        seek_map: Dict[int, int] = {}
+        cue_times: List[int] = []
+        pos = segment_start
+        while pos < segment_end:
+            try:
+                element_id, size, data_start = _read_header(reader, pos)
+            except EOFError:
+                break
+            if element_id == CLUSTER:
+                if report["first_cluster_position"] is None:
+                    report["first_cluster_position"] = pos
+                # Cues 位置已知，或簇大小未知无法跳过时，停止顶层遍历
+                if report["cues_position"] is not None or CUES in seek_map or size == UNKNOWN_SIZE:
+                    break
+            elif size == UNKNOWN_SIZE:
+                break
+            elif element_id == SEEK_HEAD:
+                seek_map.update(_parse_seek_head(reader, data_start, data_start + size, segment_start))
+            elif element_id == INFO:
+                for child_id, child_size, child_start in _children(reader, data_start, data_start + size):
+                    reader.seek(child_start)
+                    if child_id == TIMECODE_SCALE:
+                        timecode_scale = _read_uint(reader, child_size) or timecode_scale
+                    elif child_id == DURATION:
+                        duration_ticks = _read_float(reader, child_size)
+            elif element_id == TRACKS:
+                _parse_video_track(reader, data_start, data_start + size, report)
+            elif element_id == CUES:
+                report["cues_position"] = pos
+                if size <= MAX_METADATA_SIZE:
+                    cue_times = _parse_cue_times(reader, data_start, data_start + size)
+            pos = data_start + size
+
+        if report["cues_position"] is None and CUES in seek_map:
+            report["cues_position"] = seek_map[CUES]
+        if report["cues_position"] is not None and report["first_cluster_position"] is not None:
+            report["cues_before_clusters"] = report["cues_position"] < report["first_cluster_position"]
+        elif report["first_cluster_position"] is not None:
+            report["cues_before_clusters"] = False
+
+        keyframes: List[int] = []
+        last_timecode = 0
+        if report["first_cluster_position"] is not None:
+            keyframes, _, last_timecode = _scan_clusters(
+                reader,
+                int(report["first_cluster_position"]),
+                segment_end,
+                report.get("video_track"),
+                max_clusters,
+            )
+        if len(keyframes) < 2 and len(cue_times) >= 2:
+            keyframes = cue_times
+        report["bytes_read"] = reader.bytes_read
+
+    scale = timecode_scale / 1_000_000_000
+    if duration_ticks:
+        report["duration"] = duration_ticks * scale
+    if report["duration"]:
+        report["bitrate_kbps"] = file_size * 8 / report["duration"] / 1000
+    keyframes = sorted(set(keyframes))
+    if len(keyframes) >= 2:
+        gaps = [(b - a) * scale for a, b in zip(keyframes, keyframes[1:])]
+        report["keyframe_interval_max"] = max(gaps)
+        report["keyframe_interval_avg"] = sum(gaps) / len(gaps)
+    elif len(keyframes) == 1 and last_timecode > keyframes[0]:
+        # 扫描范围内只有一个关键帧，间隔至少为已扫描的时长
+        report["keyframe_interval_max"] = (last_timecode - keyframes[0]) * scale
+    report["keyframes_scanned"] = len(keyframes)
+    return report
+
+
+def resolve_budget(overrides: Optional[Dict[str, Dict[str, object]]] = None) -> Dict[str, Dict[str, object]]:
+    budget = {level: dict(values) for level, values in DEFAULT_BUDGET.items()}
+    for level, values in (overrides or {}).items():
+        if level in budget and isinstance(values, dict):
+            budget[level].update(values)
+    return budget
+
+
+def _violations(report: Dict[str, object], limits: Dict[str, object]) -> List[str]:
+    messages = []
+    bitrate = report.get("bitrate_kbps")
+    if bitrate and limits.get("max_bitrate_kbps") and bitrate > limits["max_bitrate_kbps"]:
+        messages.append(f"码率 {bitrate:.0f} kbps 超过 {limits['max_bitrate_kbps']} kbps")
+    interval = report.get("keyframe_interval_max")
+    if interval and limits.get("max_keyframe_interval") and interval > limits["max_keyframe_interval"]:
+        messages.append(f"关键帧间隔 {interval:.1f} s 超过 {limits['max_keyframe_interval']} s")
+    width, height = report.get("width"), report.get("height")
+    if width and limits.get("max_width") and width > limits["max_width"]:
+        messages.append(f"宽度 {width}px 超过 {limits['max_width']}px")
+    if height and limits.get("max_height") and height > limits["max_height"]:
+        messages.append(f"高度 {height}px 超过 {limits['max_height']}px")
+    size_mb = int(report.get("size") or 0) / (1024 * 1024)
+    if limits.get("max_size_mb") and size_mb > limits["max_size_mb"]:
+        messages.append(f"文件大小 {size_mb:.1f} MB 超过 {limits['max_size_mb']} MB")
+    if limits.get("require_cues_front") and report.get("cues_before_clusters") is False:
+        messages.append("Cues 索引位于文件末尾（或缺失），浏览器需先下载更多数据才能开始播放")
+    return messages
+
+
+def evaluate_webm(report: Dict[str, object], budget: Optional[Dict[str, Dict[str, object]]] = None) -> Tuple[str, List[str]]:
+    """按预算给出结论："ok" / "warn" / "refuse" 以及对应原因。"""
+    budget = resolve_budget(budget)
+    refuse = _violations(report, budget["refuse"])
+    if refuse:
+        return "refuse", refuse
+    warn = _violations(report, budget["warn"])
+    if warn:
+        return "warn", warn
+    return "ok", []
+
+
+def describe_report(report: Dict[str, object]) -> str:
+    parts = []
+    if report.get("width") and report.get("height"):
+        parts.append(f"{report['width']}×{report['height']}")
+    if report.get("codec"):
+        parts.append(str(report["codec"]))
+    if report.get("duration"):
+        parts.append(f"{report['duration']:.1f} s")
+    if report.get("bitrate_kbps"):
+        parts.append(f"{report['bitrate_kbps']:.0f} kbps")
+    if report.get("keyframe_interval_max"):
+        parts.append(f"最大关键帧间隔 {report['keyframe_interval_max']:.1f} s")
+    cues = report.get("cues_before_clusters")
+    parts.append("Cues 在前" if cues else ("Cues 在末尾" if report.get("cues_position") else "无 Cues"))
+    return "，".join(parts)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import BinaryIO, Iterator, Tuple
+
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+LOCAL_SIG = b"PK\x03\x04"
+CENTRAL_SIG = b"PK\x01\x02"
+END_SIG = b"PK\x05\x06"
+ZIP64_END_SIG = b"PK\x06\x06"
+DESCRIPTOR_SIG = b"PK\x07\x08"
+ZIP64_EXTRA_ID = 0x0001
+CHUNK_SIZE = 1024 * 1024
+
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+
+class _BufferedStream:
+    """在不可 seek 的输入流上提供按需读取与回退，内存占用不超过几个块。"""
+
+    def __init__(self, raw: BinaryIO):
+        self._read = getattr(raw, "read1", raw.read)
+        self.buf = bytearray()
+        self.eof = False
+
+    def fill(self, size: int) -> bool:
+        while len(self.buf) < size and not self.eof:
+            chunk = self._read(CHUNK_SIZE)
+            if not chunk:
+                self.eof = True
+            else:
+                self.buf += chunk
+        return len(self.buf) >= size
+
+    def take(self, size: int) -> bytes:
+        if not self.fill(size):
+            raise RuntimeError("压缩包数据不完整。")
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        return data
+
+    def take_some(self, limit: int) -> bytes:
+        if not self.buf:
+            self.fill(1)
+        data = bytes(self.buf[:limit])
+        del self.buf[:limit]
+        return data
+
+    def push_back(self, data: bytes):
+        self.buf[0:0] = data
+
+    def drain(self):
+        self.buf.clear()
+        while not self.eof:
+            if not self._read(CHUNK_SIZE):
+                self.eof = True
+
+
+def _zip64_sizes(extra: bytes, csize: int, usize: int) -> Tuple[bool, int, int]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[pos:pos + 4])
+        if header_id == ZIP64_EXTRA_ID:
+            values = extra[pos + 4:pos + 4 + size]
+            fields = [struct.unpack("<Q", values[i:i + 8])[0] for i in range(0, len(values) - 7, 8)]
+            if usize == 0xFFFFFFFF and fields:
+                usize = fields.pop(0)
+            if csize == 0xFFFFFFFF and fields:
+                csize = fields.pop(0)
+            return True, csize, usize
+        pos += 4 + size
+    return False, csize, usize
+
+
+def _read_descriptor(reader: _BufferedStream, zip64: bool) -> Tuple[int, int]:
+    reader.fill(4)
+    if bytes(reader.buf[:4]) == DESCRIPTOR_SIG:
+        reader.take(4)
+    if zip64:
+        crc, csize, _ = struct.unpack("<LQQ", reader.take(20))
+    else:
+        crc, csize, _ = struct.unpack("<LLL", reader.take(12))
+    return crc, csize
+
+
+def _stored_with_descriptor(reader: _BufferedStream, name: str, zip64: bool) -> Iterator[bytes]:
+    """STORED 且使用数据描述符的成员没有长度信息，只能查找与已读字节数、CRC 都吻合的描述符。"""
+    desc_len = 24 if zip64 else 16
+    size_fmt = "<LQ" if zip64 else "<LL"
+    emitted = 0
+    running = 0
+    reader.fill(desc_len)
+    while True:
+        buf = reader.buf
+        start = 0
+        while True:
+            idx = buf.find(DESCRIPTOR_SIG, start)
+            if idx < 0:
+                break
+            if len(buf) < idx + desc_len and not reader.fill(idx + desc_len):
+                break
+            crc, csize = struct.unpack(size_fmt, bytes(buf[idx + 4:idx + 4 + struct.calcsize(size_fmt)]))
+            if csize == emitted + idx and crc == zlib.crc32(buf[:idx], running):
+                data = reader.take(idx)
+                reader.take(desc_len)
+                if data:
+                    yield data
+                return
+            start = idx + 1
+        keep = desc_len - 1
+        if len(buf) > keep:
+            data = reader.take(len(buf) - keep)
+            running = zlib.crc32(data, running)
+            emitted += len(data)
+            yield data
+        if not reader.fill(len(reader.buf) + 1):
+            raise RuntimeError(f"压缩包成员 {name} 不完整。")
+
+
+def _member_chunks(
+    reader: _BufferedStream,
+    name: str,
+    flags: int,
+    method: int,
+    crc: int,
+    csize: int,
+    zip64: bool,
+) -> Iterator[bytes]:
+    has_descriptor = bool(flags & FLAG_DATA_DESCRIPTOR)
+    if method == 0 and has_descriptor:
+        yield from _stored_with_descriptor(reader, name, zip64)
+        return
+
+    running = 0
+    if method == 0:
+        remaining = csize
+        while remaining:
+            data = reader.take_some(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise RuntimeError(f"压缩包成员 {name} 不完整。")
+            remaining -= len(data)
+            running = zlib.crc32(data, running)
+            yield data
+    else:
+        inflater = zlib.decompressobj(-15)
+        remaining = None if has_descriptor else csize
+        while not inflater.eof:
+            if remaining == 0:
+                raise RuntimeError(f"压缩包成员 {name} 解压失败。")
+            data = reader.take_some(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not data:
+                raise RuntimeError(f"压缩包成员 {name} 不完整。")
+            if remaining is not None:
+                remaining -= len(data)
+            try:
+                out = inflater.decompress(data)
+            except zlib.error as exc:
+                raise RuntimeError(f"压缩包成员 {name} 解压失败: {exc}")
+            if out:
+                running = zlib.crc32(out, running)
+                yield out
+        if inflater.unused_data:
+            reader.push_back(inflater.unused_data)
+    if has_descriptor:
+        crc, _ = _read_descriptor(reader, zip64)
+    if running != crc:
+        raise RuntimeError(f"压缩包成员 {name} CRC 校验失败。")
+
+
+def iter_zip_stream(stream: BinaryIO) -> Iterator[Tuple[str, Iterator[bytes]]]:
+    """
+    顺序读取 ZIP 本地文件头，逐个产出 (成员名, 数据块迭代器)，不依赖中央目录，也不需要 seek。
+    调用方未读完的成员会在取下一个成员前自动跳过。
+    """
+    reader = _BufferedStream(stream)
+    while True:
+        if not reader.fill(4):
+            # 未遇到中央目录就结束，说明流在成员之间被截断
+            raise RuntimeError("压缩包数据不完整。")
+        sig = bytes(reader.buf[:4])
+        if sig in (CENTRAL_SIG, END_SIG, ZIP64_END_SIG):
+            reader.drain()
+            return
+        if sig != LOCAL_SIG:
+            raise RuntimeError("无法识别的压缩包结构。")
+        _, _, flags, method, _, _, crc, csize, usize, name_len, extra_len = LOCAL_HEADER.unpack(reader.take(LOCAL_HEADER.size))
+        raw_name = reader.take(name_len)
+        extra = reader.take(extra_len)
+        name = raw_name.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+        if flags & FLAG_ENCRYPTED:
+            raise RuntimeError("不支持加密的压缩包。")
+        if method not in (0, 8):
+            raise RuntimeError(f"不支持的压缩方式: {method}")
+        zip64, csize, usize = _zip64_sizes(extra, csize, usize)
+        chunks = _member_chunks(reader, name, flags, method, crc, csize, zip64)
+        yield name, chunks
+        for _ in chunks:
+            pass
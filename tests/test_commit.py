@@ -0,0 +1,93 @@
+import json
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from installer_app import core
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+
+HOLD_LOCK = """
+import sys, time
+from pathlib import Path
+from installer_app import core
+with core.lock_root(Path(sys.argv[1])):
+    print("locked", flush=True)
+    time.sleep(float(sys.argv[2]))
+"""
+
+
+def make_pending(root: Path, state: str) -> dict:
+    """构造一次在 rename 途中被打断的提交：a 已经就位，b 仍停留在 .staged。"""
+    (root / "sub").mkdir(parents=True)
+    files = {"a.txt": root / "a.txt", "sub/b.txt": root / "sub/b.txt"}
+    for path in files.values():
+        path.write_text("old", encoding="utf-8")
+    entries = [{"target": rel, "staged": rel + core.STAGED_SUFFIX} for rel in files]
+    (root / "sub/b.txt.staged").write_text("new", encoding="utf-8")
+    if state == "commit":
+        files["a.txt"].write_text("new", encoding="utf-8")
+    else:
+        (root / "a.txt.staged").write_text("new", encoding="utf-8")
+    (root / core.JOURNAL_NAME).write_text(json.dumps({"state": state, "entries": entries}), encoding="utf-8")
+    return files
+
+
+def staged_leftovers(root: Path) -> list:
+    return [p for p in root.rglob("*" + core.STAGED_SUFFIX)]
+
+
+def test_commit_journal_rolls_forward(tmp_path):
+    files = make_pending(tmp_path, "commit")
+
+    assert core.recover_pending_commit(tmp_path) == "forward"
+    assert {rel: path.read_text(encoding="utf-8") for rel, path in files.items()} == {"a.txt": "new", "sub/b.txt": "new"}
+    assert staged_leftovers(tmp_path) == []
+    assert not (tmp_path / core.JOURNAL_NAME).exists()
+
+
+def test_commit_journal_rolls_forward_after_root_moved(tmp_path):
+    old_root = tmp_path / "mnt-a"
+    make_pending(old_root, "commit")
+    new_root = tmp_path / "mnt-b"
+    shutil.move(str(old_root), str(new_root))
+
+    assert core.recover_pending_commit(new_root) == "forward"
+    assert (new_root / "sub/b.txt").read_text(encoding="utf-8") == "new"
+    assert staged_leftovers(new_root) == []
+
+
+def test_prepare_journal_rolls_back(tmp_path):
+    files = make_pending(tmp_path, "prepare")
+
+    assert core.recover_pending_commit(tmp_path) == "back"
+    assert {rel: path.read_text(encoding="utf-8") for rel, path in files.items()} == {"a.txt": "old", "sub/b.txt": "old"}
+    assert staged_leftovers(tmp_path) == []
+    assert not (tmp_path / core.JOURNAL_NAME).exists()
+
+
+def test_lock_times_out_while_held_by_another_process(tmp_path):
+    holder = subprocess.Popen(
+        [sys.executable, "-c", HOLD_LOCK, str(tmp_path), "10"],
+        cwd=PACKAGE_ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        started = time.monotonic()
+        with pytest.raises(RuntimeError):
+            with core.lock_root(tmp_path, timeout=0.3):
+                pass
+        assert time.monotonic() - started < 5
+    finally:
+        holder.kill()
+        holder.wait()
+
+    # 持锁进程退出后即可重新获得锁
+    with core.lock_root(tmp_path, timeout=1):
+        pass
@@ -0,0 +1,115 @@
+import json
+import os
+import struct
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from installer_app import core, zipstream
+
+
+class UnseekableSink:
+    """只有 write/flush 的输出流，模拟 stdout 或管道，迫使 zipfile 使用数据描述符。"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, chunk):
+        self.data += chunk
+        return len(chunk)
+
+    def flush(self):
+        pass
+
+
+class UnseekableSource:
+    """只能顺序读取的输入流，每次最多返回 size 字节。"""
+
+    def __init__(self, data: bytes, step: int = 7919):
+        self._buf = BytesIO(data)
+        self._step = step
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._step
+        return self._buf.read(min(size, self._step))
+
+
+def make_theme(root: Path, theme_id: str = "demo") -> dict:
+    tpl_dir = root / "templates/joinmenu-so-nice" / theme_id
+    pub_dir = root / "public/joinmenu-so-nice" / theme_id
+    (pub_dir / "fonts").mkdir(parents=True)
+    tpl_dir.mkdir(parents=True)
+    # 视频中混入伪造的描述符签名，确保 STORED 成员不会在错误位置截断
+    video = os.urandom(200_000) + zipstream.DESCRIPTOR_SIG + struct.pack("<LLL", 0, 12, 12) + os.urandom(50_000)
+    files = {
+        f"templates/joinmenu-so-nice/{theme_id}/join.hbs": b"<div>{{world.title}}</div>\n" * 200,
+        f"public/joinmenu-so-nice/{theme_id}/joinmenu.js": b"console.log('join theme');\n" * 5000,
+        f"public/joinmenu-so-nice/{theme_id}/custom.css": b"body { font-family: a; }\n",
+        f"public/joinmenu-so-nice/{theme_id}/fonts/a.woff2": os.urandom(30_000),
+        f"public/joinmenu-so-nice/{theme_id}/background.webm": video,
+        f"public/joinmenu-so-nice/{theme_id}/empty.css": b"",
+    }
+    for rel, data in files.items():
+        (root / rel).write_bytes(data)
+    return files
+
+
+def export_to_stream(root: Path, theme_id: str = "demo") -> bytes:
+    sink = UnseekableSink()
+    core.export_theme(root, theme_id, "Demo", sink)
+    return bytes(sink.data)
+
+
+def read_back(data: bytes) -> dict:
+    return {name: b"".join(chunks) for name, chunks in zipstream.iter_zip_stream(UnseekableSource(data))}
+
+
+def test_round_trip_deflated_and_stored(tmp_path):
+    files = make_theme(tmp_path)
+    data = export_to_stream(tmp_path)
+
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        infos = {info.filename: info for info in zf.infolist()}
+    assert all(info.flag_bits & zipstream.FLAG_DATA_DESCRIPTOR for info in infos.values())
+    assert infos["public/joinmenu-so-nice/demo/background.webm"].compress_type == zipfile.ZIP_STORED
+    assert infos["public/joinmenu-so-nice/demo/joinmenu.js"].compress_type == zipfile.ZIP_DEFLATED
+
+    members = read_back(data)
+    assert json.loads(members.pop("theme.json"))["id"] == "demo"
+    assert members == files
+
+
+def test_round_trip_zip64(tmp_path, monkeypatch):
+    files = make_theme(tmp_path)
+    # 调低阈值，让小文件也走 force_zip64 分支，无需生成 4 GiB 的数据
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 16 * 1024)
+    data = export_to_stream(tmp_path)
+
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        zip64_members = {info.filename for info in zf.infolist() if info.extract_version >= zipfile.ZIP64_VERSION}
+    assert "public/joinmenu-so-nice/demo/background.webm" in zip64_members
+    assert "public/joinmenu-so-nice/demo/joinmenu.js" in zip64_members
+
+    members = read_back(data)
+    members.pop("theme.json")
+    assert members == files
+
+
+def test_truncated_stream_is_rejected_without_touching_root(tmp_path):
+    source = tmp_path / "source"
+    make_theme(source)
+    data = export_to_stream(source)
+    target = tmp_path / "target"
+    target.mkdir()
+
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        central_start = zf.start_dir
+
+    # 分别截断在成员中间与最后一个成员之后（中央目录之前）
+    for cut in (len(data) // 2, central_start):
+        with pytest.raises(RuntimeError):
+            core._install_members(target, zipstream.iter_zip_stream(UnseekableSource(data[:cut])), require_meta_first=True)
+        assert [p for p in target.rglob("*") if p.is_file()] == []